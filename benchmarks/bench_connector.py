@@ -0,0 +1,201 @@
+"""Load benchmarks of ConnectorHub against the hub simulator.
+
+Measures discovery time, command round trip, group command time, report
+throughput and CPU time per received message::
+
+    python benchmarks/bench_connector.py --hubs 4 --blinds 30 --json out.json
+
+Compare the --json output of two runs to catch regressions.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "connector"), os.path.join(ROOT, "tools")]
+
+import connectorlocal  # noqa: E402
+from hub_simulator import FRONTADDRESS, REPLYPORT, HubSimulator  # noqa: E402
+
+
+def _percentile(values, percent):
+    """return the value below which percent of values fall."""
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def _connector(simulator, unicast):
+    """return a ConnectorHub talking to the simulator."""
+    return connectorlocal.ConnectorHub(
+        ip=simulator.ips,
+        key=simulator.key,
+        send_address=FRONTADDRESS,
+        send_port=simulator.port,
+        receive_port=REPLYPORT,
+        unicast=unicast,
+    )
+
+
+async def bench_discovery(connector, simulator):
+    """Time from start to a complete device list."""
+    start = time.perf_counter()
+    await connector.async_start()
+    devices = await connector.device_list()
+    elapsed = time.perf_counter() - start
+    blinds = sum(len(hub.blinds_list) for hub in (devices or {}).values())
+    return {"discovery_s": elapsed, "blinds_found": blinds}
+
+
+async def bench_round_trip(connector, simulator, count):
+    """Time one status request after another."""
+    blinds = [
+        blind
+        for hub in connector.devices.values()
+        for blind in hub.blinds_list.values()
+    ]
+    latencies = []
+    timeouts = 0
+    for index in range(count):
+        blind = blinds[index % len(blinds)]
+        start = time.perf_counter()
+        try:
+            await blind.async_update_state()
+        except asyncio.TimeoutError:
+            timeouts += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+    return {
+        "round_trip_p50_ms": 1000 * _percentile(latencies, 50),
+        "round_trip_p95_ms": 1000 * _percentile(latencies, 95),
+        "round_trip_max_ms": 1000 * max(latencies),
+        "round_trip_timeouts": timeouts,
+    }
+
+
+async def bench_group_move(connector, simulator):
+    """Time a target position sent to every blind at once."""
+    commands = [
+        (blind.mac, {"targetPosition": 50})
+        for hub in connector.devices.values()
+        for blind in hub.blinds_list.values()
+    ]
+    start = time.perf_counter()
+    results = await connector.async_move_many(commands)
+    elapsed = time.perf_counter() - start
+    failed = sum(isinstance(result, Exception) for result in results.values())
+    return {"group_move_s": elapsed, "group_move_failed": failed}
+
+
+async def bench_reports(connector, simulator, count, burst):
+    """Push reports burst at a time per loop cycle and count what arrives."""
+    counters = connector.metrics.snapshot()["counters"]
+    before = counters.get("received", {}).get("msgType", {}).get("Report", 0)
+    start = time.perf_counter()
+    await simulator.async_send_reports(count, burst)
+    received = 0
+    idle = 0
+    while idle < 5:
+        await asyncio.sleep(0.02)
+        counters = connector.metrics.snapshot()["counters"]
+        now = counters["received"]["msgType"].get("Report", 0) - before
+        idle = idle + 1 if now == received else 0
+        received = now
+        if received >= count:
+            break
+    elapsed = time.perf_counter() - start
+    return {
+        "reports_sent": count,
+        "reports_received": received,
+        "reports_per_s": received / elapsed,
+    }
+
+
+def bench_cpu_per_message(connector, simulator, count):
+    """CPU time of handling one received report, without the network."""
+    address = (simulator.ips[0], REPLYPORT)
+    blinds = list(simulator.hubs[0].blinds.values())
+    payloads = [
+        json.dumps(
+            {
+                "msgType": "Report",
+                "mac": blind.mac,
+                "deviceType": "10000000",
+                "data": blind.state(),
+            }
+        ).encode()
+        for blind in blinds
+    ]
+    start = time.process_time()
+    for index in range(count):
+        connector._handle_datagram(payloads[index % len(payloads)], address)
+    elapsed = time.process_time() - start
+    return {"cpu_per_message_us": 1e6 * elapsed / count}
+
+
+async def run(args):
+    """Run every benchmark and return the results."""
+    simulator = HubSimulator(
+        hubs=args.hubs,
+        blinds=args.blinds,
+        latency=args.latency,
+        loss=args.loss,
+        multicast_loss=args.multicast_loss,
+        seed=args.seed,
+    )
+    await simulator.start()
+    connector = _connector(simulator, args.unicast)
+    results = {
+        "hubs": args.hubs,
+        "blinds": args.hubs * args.blinds,
+        "unicast": args.unicast,
+    }
+    try:
+        results.update(await bench_discovery(connector, simulator))
+        if not connector.devices:
+            return results
+        results.update(await bench_round_trip(connector, simulator, args.commands))
+        results.update(await bench_group_move(connector, simulator))
+        results.update(
+            await bench_reports(connector, simulator, args.reports, args.burst)
+        )
+        results.update(bench_cpu_per_message(connector, simulator, args.messages))
+    finally:
+        connector.close_receive_data()
+        simulator.close()
+    return results
+
+
+def main():
+    """Parse the arguments, run and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--hubs", type=int, default=2)
+    parser.add_argument("--blinds", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--loss", type=float, default=0.0)
+    parser.add_argument("--multicast-loss", type=float)
+    parser.add_argument("--unicast", action="store_true")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--commands", type=int, default=100)
+    parser.add_argument("--reports", type=int, default=5000)
+    parser.add_argument("--burst", type=int, default=1)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+    results = asyncio.run(run(args))
+    for name, value in results.items():
+        if isinstance(value, float):
+            value = f"{value:.3f}"
+        print(f"{name:<24}{value}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
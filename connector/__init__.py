@@ -3,88 +3,185 @@ from __future__ import annotations
 
 from datetime import timedelta
 import logging
-from socket import timeout
 
-from .connectorlocal import WIFIMOTORTYPE, ConnectorHub
+from .connectorlocal import ConnectorHub, Hub, MulticastListener
+import voluptuous as vol
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import CONF_API_KEY, CONF_HOST, EVENT_HOMEASSISTANT_STOP
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, ServiceCall, callback
 from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 
+from .config_flow import unique_id_for_key
 from .const import (
+    ATTR_MAX_AGE,
+    CONF_INTERFACE,
+    CONF_STALE_AFTER,
+    CONF_UNICAST,
+    DEFAULT_INTERFACE,
+    DEFAULT_STALE_AFTER,
+    DEFAULT_UNICAST,
     DOMAIN,
     KEY_COORDINATOR,
     KEY_GATEWAY,
     KEY_MULTICAST_LISTENER,
+    KEY_STORE,
     MANUFACTURER,
     PLATFORMS,
+    SERVICE_REFRESH_STALE,
+    SIGNAL_CONNECTION_CHANGED,
+    SIGNAL_DEVICES_CHANGED,
+    STORAGE_VERSION,
+    TOPOLOGY_SAVE_DELAY,
+    UPDATE_INTERVAL,
 )
 
 _LOGGER = logging.getLogger(__name__)
 
+LEGACY_UNIQUE_ID = "ConnectorLocalControlID"
+
+REFRESH_STALE_SCHEMA = vol.Schema(
+    {vol.Optional(ATTR_MAX_AGE): vol.All(vol.Coerce(int), vol.Range(min=0))}
+)
+
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up connector from a config entry."""
     hass.data.setdefault(DOMAIN, {})
     host = entry.data[CONF_HOST]
     key = entry.data[CONF_API_KEY]
-    connector = ConnectorHub(ip=host, key=key)
-    connector.start_receive_data()
-    hub_list = await connector.device_list()
+    if entry.unique_id in (LEGACY_UNIQUE_ID, key):
+        hass.config_entries.async_update_entry(entry, unique_id=unique_id_for_key(key))
+    interface = entry.options.get(CONF_INTERFACE, DEFAULT_INTERFACE)
+    listeners = hass.data[DOMAIN].setdefault(KEY_MULTICAST_LISTENER, {})
+    if interface not in listeners:
+        listeners[interface] = MulticastListener(
+            interface=None if interface == DEFAULT_INTERFACE else interface
+        )
+    connector = ConnectorHub(
+        ip=host,
+        key=key,
+        interface=None if interface == DEFAULT_INTERFACE else interface,
+        unicast=entry.options.get(CONF_UNICAST, DEFAULT_UNICAST),
+        listener=listeners[interface],
+    )
+    store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}")
+    device_registry = dr.async_get(hass)
+
+    @callback
+    def _async_register_hub(hub):
+        """Add a hub to the device registry."""
+        device_registry.async_get_or_create(
+            config_entry_id=entry.entry_id,
+            connections={(dr.CONNECTION_NETWORK_MAC, hub.hub_mac)},
+            identifiers={(DOMAIN, hub.hub_mac)},
+            manufacturer=MANUFACTURER,
+            name=entry.title,
+            model="Wi-Fi Bridge:" + hub.hub_mac,
+            sw_version=hub.hub_version,
+        )
+
+    @callback
+    def _async_devices_changed(added, removed):
+        """Register new hubs, tell the platforms and store the topology."""
+        for device in added:
+            if isinstance(device, Hub):
+                _async_register_hub(device)
+        async_dispatcher_send(
+            hass, SIGNAL_DEVICES_CHANGED.format(entry.entry_id), added, removed
+        )
+        store.async_delay_save(connector.topology, TOPOLOGY_SAVE_DELAY)
+
+    @callback
+    def _async_connection_changed(connected):
+        """Tell the entities that receiving stopped or started again."""
+        async_dispatcher_send(
+            hass, SIGNAL_CONNECTION_CHANGED.format(entry.entry_id), connected
+        )
+
+    async def _async_discover():
+        """Wait for discovery and store the topology it found."""
+        if await connector.device_list() is not None:
+            store.async_delay_save(connector.topology, TOPOLOGY_SAVE_DELAY)
+
+    if (cached := await store.async_load()) is not None:
+        connector.load_topology(cached)
+    connector.register_topology_callback(_async_devices_changed)
+    connector.register_connection_callback(_async_connection_changed)
+    await connector.async_start()
+    if connector.devices:
+        entry.async_create_background_task(
+            hass, _async_discover(), f"{DOMAIN} discovery {entry.entry_id}"
+        )
+    else:
+        await _async_discover()
+    hub_list = connector.devices
 
-    if KEY_MULTICAST_LISTENER not in hass.data[DOMAIN]:
-        hass.data[DOMAIN][KEY_MULTICAST_LISTENER] = connector
+    @callback
+    def _async_save_topology(event):
+        """Store the last known positions when Home Assistant stops."""
+        store.async_delay_save(connector.topology, TOPOLOGY_SAVE_DELAY)
 
-        def stop_motion_multicast(event):
-            """Stop multicast thread."""
-            _LOGGER.debug("Shutting down Connector Listener")
-            connector.close_receive_data()
+    entry.async_on_unload(
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _async_save_topology)
+    )
+
+    @callback
+    def stop_motion_multicast(event):
+        """Stop receiving, closing the shared socket after the last entry."""
+        _LOGGER.debug("Shutting down Connector Listener")
+        connector.close_receive_data()
 
+    entry.async_on_unload(
         hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, stop_motion_multicast)
+    )
 
-    def _update_gateway():
-        """Call all updates using one async_add_executor_job."""
-        for device in hub_list.values():
-            try:
-                device.update_blinds()
-            except timeout:
-                _LOGGER.warning("Update gateway timeout")
+    stale_after = entry.options.get(CONF_STALE_AFTER, DEFAULT_STALE_AFTER)
 
     async def async_update_data():
-        """Fetch data from the gateway and blinds."""
-        try:
-            await hass.async_add_executor_job(_update_gateway)
-        except timeout:
-            _LOGGER.warning("Async update data timeout")
+        """Poll the blinds which have not pushed a report recently."""
+        await connector.async_update_devices(max_age=stale_after)
 
     coordinator = DataUpdateCoordinator(
         hass,
         _LOGGER,
         name=entry.title,
         update_method=async_update_data,
-        update_interval=timedelta(seconds=3600),
+        update_interval=timedelta(seconds=UPDATE_INTERVAL),
     )
 
     hass.data[DOMAIN][entry.entry_id] = {
         KEY_GATEWAY: connector,
         KEY_COORDINATOR: coordinator,
+        KEY_STORE: store,
     }
 
-    device_registry = dr.async_get(hass)
-    if hub_list is not None:
-        for hub in hub_list.values():
-            if hub.devicetype not in WIFIMOTORTYPE:
-                device_registry.async_get_or_create(
-                    config_entry_id=entry.entry_id,
-                    connections={(dr.CONNECTION_NETWORK_MAC, hub.hub_mac)},
-                    identifiers={(DOMAIN, hub.hub_mac)},
-                    manufacturer=MANUFACTURER,
-                    name=entry.title,
-                    model="Wi-Fi Bridge:" + hub.hub_mac,
-                    sw_version=hub.hub_version,
-                )
+    for hub in hub_list.values():
+        if isinstance(hub, Hub):
+            _async_register_hub(hub)
+
+    async def async_refresh_stale(call: ServiceCall) -> None:
+        """Poll the stale blinds of every entry."""
+        for config_entry in hass.config_entries.async_entries(DOMAIN):
+            if (entry_data := hass.data[DOMAIN].get(config_entry.entry_id)) is None:
+                continue
+            max_age = call.data.get(
+                ATTR_MAX_AGE,
+                config_entry.options.get(CONF_STALE_AFTER, DEFAULT_STALE_AFTER),
+            )
+            await entry_data[KEY_GATEWAY].async_update_devices(max_age=max_age)
+
+    if not hass.services.has_service(DOMAIN, SERVICE_REFRESH_STALE):
+        hass.services.async_register(
+            DOMAIN,
+            SERVICE_REFRESH_STALE,
+            async_refresh_stale,
+            schema=REFRESH_STALE_SCHEMA,
+        )
+    entry.async_on_unload(entry.add_update_listener(_async_update_listener))
     for component in PLATFORMS:
         hass.async_create_task(
             hass.config_entries.async_forward_entry_setup(entry, component)
@@ -92,12 +189,20 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     return True
 
 
+async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the entry when its options change."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
-        hass.data[DOMAIN].pop(entry.entry_id)
+        entry_data = hass.data[DOMAIN].pop(entry.entry_id)
+        connector = entry_data[KEY_GATEWAY]
+        connector.close_receive_data()
+        await entry_data[KEY_STORE].async_save(connector.topology())
     if len(hass.data[DOMAIN]) == 1:
         _LOGGER.debug("Shutting down Connector Listener")
-        multicast = hass.data[DOMAIN].pop(KEY_MULTICAST_LISTENER)
-        await hass.async_add_executor_job(multicast.close_receive_data)
+        hass.data[DOMAIN].pop(KEY_MULTICAST_LISTENER)
+        hass.services.async_remove(DOMAIN, SERVICE_REFRESH_STALE)
     return unload_ok
@@ -1,15 +1,35 @@
 """Config flow for Connector integration."""
 from __future__ import annotations
 
+import hashlib
 import logging
 
-from .connectorlocal import ConnectorHub
+from .connectorlocal import (
+    PROBE_KEY_ERROR,
+    PROBE_NO_ANSWER,
+    PROBE_PORT_ERROR,
+    ConnectorHub,
+)
 import voluptuous as vol
 
 from homeassistant import config_entries
+from homeassistant.components import network
 from homeassistant.const import CONF_API_KEY, CONF_HOST
+from homeassistant.core import callback
 
-from .const import DEFAULT_HUB_NAME, DOMAIN
+from .const import (
+    CONF_INTERFACE,
+    CONF_STALE_AFTER,
+    CONF_UNICAST,
+    CONF_WRITE_INTERVAL,
+    DEFAULT_HUB_NAME,
+    DEFAULT_INTERFACE,
+    DEFAULT_STALE_AFTER,
+    DEFAULT_UNICAST,
+    DEFAULT_WRITE_INTERVAL,
+    DOMAIN,
+    KEY_MULTICAST_LISTENER,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -21,6 +41,11 @@ STEP_USER_DATA_SCHEMA = vol.Schema(
 )
 
 
+def unique_id_for_key(key):
+    """Return the unique_id of the entry of a key, which does not reveal it."""
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
 class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for Connector."""
 
@@ -28,11 +53,18 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     CONNECTION_CLASS = config_entries.CONN_CLASS_UNKNOWN
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        """Get the options flow."""
+        return OptionsFlowHandler(config_entry)
+
     def __init__(self):
         """Initialize the connector hub."""
         self.host = None
         self.key = None
         self.errors = {}
+        self.placeholders = {}
 
     async def async_step_user(self, user_input=None):
         """Handle a flow initialized by the user."""
@@ -42,24 +74,84 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             return await self.async_step_connect()
 
         return self.async_show_form(
-            step_id="user", data_schema=STEP_USER_DATA_SCHEMA, errors=self.errors
+            step_id="user",
+            data_schema=STEP_USER_DATA_SCHEMA,
+            errors=self.errors,
+            description_placeholders=self.placeholders,
         )
 
     async def async_step_connect(self):
-        """Connect to the Connector Hub."""
-        await self.async_set_unique_id("ConnectorLocalControlID")
+        """Check the key with each hub, without reading every blind."""
+        await self.async_set_unique_id(unique_id_for_key(self.key))
         self._abort_if_unique_id_configured()
-        connector = ConnectorHub(ip=self.host, key=self.key)
-        connector.start_receive_data()
-        if connector.is_connected:
-            devicelist = await connector.device_list()
-            connector.close_receive_data()
-            if connector.error_code == 1001:
-                return self.async_abort(reason="key_error")
-            if devicelist is None:
-                return self.async_abort(reason="device_none")
-            return self.async_create_entry(
-                title=DEFAULT_HUB_NAME,
-                data={CONF_HOST: self.host, CONF_API_KEY: self.key},
-            )
-        return self.async_abort(reason="port_error")
+        listeners = self.hass.data.get(DOMAIN, {}).get(KEY_MULTICAST_LISTENER, {})
+        connector = ConnectorHub(
+            ip=self.host, key=self.key, listener=listeners.get(DEFAULT_INTERFACE)
+        )
+        results = await connector.async_probe()
+        _LOGGER.debug("Probe results: %s", results)
+        if PROBE_PORT_ERROR in results.values():
+            return self.async_abort(reason="port_error")
+        if PROBE_KEY_ERROR in results.values():
+            return self.async_abort(reason="key_error")
+        missing = [ip for ip, result in results.items() if result == PROBE_NO_ANSWER]
+        if len(missing) == len(results):
+            return self.async_abort(reason="device_none")
+        if missing:
+            self.errors = {"base": "hub_no_answer"}
+            self.placeholders = {"ips": ", ".join(missing)}
+            return await self.async_step_user()
+        return self.async_create_entry(
+            title=DEFAULT_HUB_NAME,
+            data={CONF_HOST: self.host, CONF_API_KEY: self.key},
+        )
+
+
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle the options of Connector."""
+
+    def __init__(self, config_entry):
+        """Initialize the options flow."""
+        self.config_entry = config_entry
+
+    async def async_step_init(self, user_input=None):
+        """Manage the options."""
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        interfaces = [DEFAULT_INTERFACE]
+        for adapter in await network.async_get_adapters(self.hass):
+            for ipv4 in adapter["ipv4"]:
+                interfaces.append(ipv4["address"])
+
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(
+                        CONF_STALE_AFTER,
+                        default=self.config_entry.options.get(
+                            CONF_STALE_AFTER, DEFAULT_STALE_AFTER
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=60)),
+                    vol.Optional(
+                        CONF_INTERFACE,
+                        default=self.config_entry.options.get(
+                            CONF_INTERFACE, DEFAULT_INTERFACE
+                        ),
+                    ): vol.In(interfaces),
+                    vol.Optional(
+                        CONF_UNICAST,
+                        default=self.config_entry.options.get(
+                            CONF_UNICAST, DEFAULT_UNICAST
+                        ),
+                    ): bool,
+                    vol.Optional(
+                        CONF_WRITE_INTERVAL,
+                        default=self.config_entry.options.get(
+                            CONF_WRITE_INTERVAL, DEFAULT_WRITE_INTERVAL
+                        ),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0, max=60)),
+                }
+            ),
+        )
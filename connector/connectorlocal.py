@@ -5,12 +5,30 @@
 """
 
 import datetime
+import errno
+import ipaddress
 import json
 import logging
+import random
 import socket
-from threading import Thread, Timer
+import time
+from threading import Lock, Thread
 from Cryptodome.Cipher import AES
 import asyncio
+from bisect import bisect_left
+from collections import deque
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+
+try:
+    from orjson import loads as _loads
+except ImportError:
+
+    def _loads(data):
+        """Parse json from bytes or a memoryview."""
+        return json.loads(str(data, "utf-8"))
+
 
 _LOGGER = logging.getLogger(__name__)
 BLINDSDEVICETYPE = ["10000000", "10000002", "10000011"]
@@ -21,64 +39,762 @@ UDPIPADDRESS = "238.0.0.18"
 SENDPORT = 32100
 RECEIVEPORT = 32101
 BUFFERSIZE = 2048
+RECEIVEBUFFERSIZE = 65535
+READBATCH = 64
+ICMPERRORS = [errno.ECONNREFUSED, errno.EHOSTUNREACH, errno.ENETUNREACH]
 ONEWAYWIRELESSMODE = [0, 2]
 TWOWAYWIRELESSMODE = [1, 3, 4]
+REQUEST_TIMEOUT = 1
+REQUEST_TIMEOUT_MAX = 4
+RETRY_JITTER = 0.25
+COMMAND_DEADLINE = 10
+READ_DEADLINE = 5
+RECENT_MESSAGES = 512
+SEND_INTERVAL = 0.5
+SEND_INTERVAL_MIN = 0.05
+SEND_INTERVAL_START = 0.2
+DISCOVERY_TIMEOUT = 20
+DISCOVERY_REQUESTS = 3
+DISCOVERY_RESEND = 3
+REPEATED_ACK_INTERVAL = 5
+ACK_WORKERS = 2
+UNKNOWN_DEVICE_WARN_INTERVAL = 600
+RECONNECT_DELAY = 1
+RECONNECT_DELAY_MAX = 300
+WATCHDOG_INTERVAL = 120
+PROBE_TIMEOUT = 5
+PROBE_REQUESTS = 3
+MOTION_TIMEOUT = 5
+TARGETFIELDS = ["targetPosition", "targetAngle"]
+LATENCYBUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5]
+MOVEOPERATIONS = [0, 1, 2]
+PROBE_OK = "ok"
+PROBE_KEY_ERROR = "key_error"
+PROBE_UNVERIFIED = "unverified"
+PROBE_NO_ANSWER = "no_answer"
+PROBE_PORT_ERROR = "port_error"
+
+_msgid_lock = Lock()
+_last_msgid = "0"
 
 
 def get_msgid():
-    """Get msgid."""
-    msgid = datetime.datetime.now().strftime("%Y%m%d%H%M%S%f")[0:17]
+    """Get msgid, unique even for requests sent in the same millisecond."""
+    global _last_msgid
+    with _msgid_lock:
+        msgid = datetime.datetime.now().strftime("%Y%m%d%H%M%S%f")[0:17]
+        if msgid <= _last_msgid:
+            msgid = str(int(_last_msgid) + 1)
+        _last_msgid = msgid
     return msgid
 
 
-async def delay(seconds):
-    await asyncio.sleep(seconds)
+class _PendingRequest:
+    """A request waiting for the ack with the same msgID."""
+
+    def __init__(self, data, ack_type, future):
+        """Init _PendingRequest class."""
+        self.data = data
+        self.ack_type = ack_type
+        self.future = future
+        self.sent_at = None
+        self.latency = None
+        self.attempts = 0
+        self.dropped = False
+
+
+class _Registry(Mapping):
+    """Devices by mac, shared by the receive threads and the event loop.
+
+    Changes are made under the lock on a copy which then replaces the
+    whole dict, so readers never lock and a snapshot never changes.
+    """
+
+    __slots__ = ("_lock", "_items")
+
+    def __init__(self):
+        """Init _Registry class."""
+        self._lock = Lock()
+        self._items = {}
+
+    def __getitem__(self, mac):
+        """return the device with this mac."""
+        return self._items[mac]
+
+    def __iter__(self):
+        """iterate over the macs of a snapshot."""
+        return iter(self._items)
+
+    def __len__(self):
+        """return the number of devices."""
+        return len(self._items)
+
+    def __contains__(self, mac):
+        """return if a device has this mac."""
+        return mac in self._items
+
+    def get(self, mac, default=None):
+        """return the device with this mac, or default."""
+        return self._items.get(mac, default)
+
+    def keys(self):
+        """return the macs of a snapshot."""
+        return self._items.keys()
+
+    def values(self):
+        """return the devices of a snapshot."""
+        return self._items.values()
+
+    def items(self):
+        """return the macs and devices of a snapshot."""
+        return self._items.items()
+
+    def snapshot(self):
+        """return a read only view of the devices, unchanged by later updates."""
+        return MappingProxyType(self._items)
+
+    def set(self, mac, device):
+        """Add or replace a device."""
+        with self._lock:
+            items = dict(self._items)
+            items[mac] = device
+            self._items = items
+
+    def setdefault(self, mac, device):
+        """Add a device unless the mac is known, return the one kept."""
+        with self._lock:
+            current = self._items.get(mac)
+            if current is not None:
+                return current
+            items = dict(self._items)
+            items[mac] = device
+            self._items = items
+            return device
+
+    def update(self, devices):
+        """Add or replace many devices at once."""
+        with self._lock:
+            items = dict(self._items)
+            items.update(devices)
+            self._items = items
+
+    def pop(self, mac, default=None):
+        """Remove a device and return it, or default if unknown."""
+        with self._lock:
+            if mac not in self._items:
+                return default
+            items = dict(self._items)
+            device = items.pop(mac)
+            self._items = items
+            return device
+
+    def clear(self):
+        """Remove every device."""
+        with self._lock:
+            self._items = {}
+
+
+def _blind_topology(blind):
+    """Return the stored form of a blind."""
+    item = {
+        "deviceType": blind.devicetype,
+        "wirelessMode": blind.wireless_mode,
+        "type": blind.type,
+    }
+    if isinstance(blind, TwoWayBlind):
+        item["position"] = blind.position
+        item["angle"] = blind.angle
+    return item
+
+
+def _finish_batch(batch, task):
+    """Hand each blind of a group command its own result."""
+    if task.cancelled():
+        for _, _, future in batch:
+            future.cancel()
+        return
+    for (_, _, future), result in zip(batch, task.result()):
+        if future.done():
+            continue
+        if isinstance(result, BaseException):
+            future.set_exception(result)
+        else:
+            future.set_result(result)
+
+
+_UNCHANGED = frozenset()
+_POSITION_CHANGED = frozenset(("position",))
+_ANGLE_CHANGED = frozenset(("angle",))
+_ERROR_CHANGED = frozenset(("last_error",))
+
+
+class DeviceEvent:
+    """An update of a device, as told to its listeners.
+
+    changed holds the names of the properties which changed, such as
+    "position", "angle" or "last_error", data the message it came with.
+    """
+
+    __slots__ = ("device", "msg_type", "changed", "data")
+
+    def __init__(self, device, msg_type, changed, data):
+        """Init DeviceEvent class."""
+        self.device = device
+        self.msg_type = msg_type
+        self.changed = changed
+        self.data = data
+
+    @property
+    def mac(self):
+        """Return the mac of the device."""
+        return self.device.mac
+
+
+class _Listener:
+    """A function subscribed to device events, with its filters."""
+
+    __slots__ = ("func", "msg_types", "fields", "loop", "executor")
+
+    def __init__(self, func, msg_types, fields, loop, executor):
+        """Init _Listener class."""
+        self.func = func
+        self.msg_types = None if msg_types is None else frozenset(msg_types)
+        self.fields = None if fields is None else frozenset(fields)
+        self.loop = loop
+        self.executor = executor
+
+    def wants(self, event):
+        """return if the event passes the filters."""
+        if self.msg_types is not None and event.msg_type not in self.msg_types:
+            return False
+        return self.fields is None or not self.fields.isdisjoint(event.changed)
+
+    def deliver(self, event):
+        """call the function on the executor, on the loop or right away."""
+        try:
+            if self.executor is not None:
+                self.executor.submit(self._call, event)
+            elif self.loop is not None and not _running_in(self.loop):
+                self.loop.call_soon_threadsafe(self._call, event)
+            else:
+                self._call(event)
+        except RuntimeError:
+            _LOGGER.debug("Listener of %s is shut down", event.mac)
+
+    def _call(self, event):
+        """call the function, keeping its errors from the other listeners."""
+        try:
+            self.func(event)
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.exception("Error in a listener of %s", event.mac)
+
+
+def _running_in(loop):
+    """Return if this is the thread running loop."""
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
+
+
+class _EventBroker:
+    """The listeners of device events, by device mac, hub mac or None for all.
+
+    Like _Registry, changes replace the whole dict under the lock so that
+    publishing, which happens for every Report, never locks.
+    """
+
+    __slots__ = ("_lock", "_listeners")
+
+    def __init__(self):
+        """Init _EventBroker class."""
+        self._lock = Lock()
+        self._listeners = {}
+
+    def subscribe(self, func, mac=None, msg_types=None, fields=None, executor=None):
+        """add a listener, return a function which removes it."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        listener = _Listener(func, msg_types, fields, loop, executor)
+        with self._lock:
+            listeners = dict(self._listeners)
+            listeners[mac] = listeners.get(mac, ()) + (listener,)
+            self._listeners = listeners
+        return lambda: self._unsubscribe(mac, listener)
+
+    def _unsubscribe(self, mac, listener):
+        """remove a listener, if it is still there."""
+        with self._lock:
+            listeners = dict(self._listeners)
+            kept = tuple(
+                item for item in listeners.get(mac, ()) if item is not listener
+            )
+            if kept:
+                listeners[mac] = kept
+            else:
+                listeners.pop(mac, None)
+            self._listeners = listeners
+
+    def publish(self, device, msg_type=None, changed=_UNCHANGED, data=None):
+        """tell the listeners of the device, of its hub and of all devices."""
+        listeners = self._listeners
+        if not listeners:
+            return
+        mac = device.mac
+        found = listeners.get(mac, ())
+        if mac[:12] != mac:
+            found += listeners.get(mac[:12], ())
+        found += listeners.get(None, ())
+        if not found:
+            return
+        event = DeviceEvent(device, msg_type, changed, data)
+        for listener in found:
+            if listener.wants(event):
+                listener.deliver(event)
+
+
+class _Histogram:
+    """Count observed values in LATENCYBUCKETS."""
+
+    def __init__(self):
+        """Init _Histogram class."""
+        self.buckets = [0] * (len(LATENCYBUCKETS) + 1)
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def observe(self, value):
+        """Add a value."""
+        self.buckets[bisect_left(LATENCYBUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def as_dict(self):
+        """return the histogram as plain data."""
+        buckets = {
+            str(bound): count for bound, count in zip(LATENCYBUCKETS, self.buckets)
+        }
+        buckets["inf"] = self.buckets[-1]
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+            "avg": self.sum / self.count if self.count else None,
+            "buckets": buckets,
+        }
+
+
+class ConnectorMetrics:
+    """Counters, gauges and latency histograms of a ConnectorHub.
+
+    Every value is kept in total and, for each label given, per label value,
+    for example count("received", msgType="Report", hub=hub_mac).
+    """
+
+    def __init__(self):
+        """Init ConnectorMetrics class."""
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    def count(self, name, amount=1, **labels):
+        """Add amount to a counter."""
+        series = self._counters.get(name)
+        if series is None:
+            series = self._counters[name] = {"total": 0}
+        series["total"] += amount
+        for kind, value in labels.items():
+            by_value = series.setdefault(kind, {})
+            by_value[value] = by_value.get(value, 0) + amount
+
+    def gauge(self, name, value, **labels):
+        """Set a gauge."""
+        series = self._gauges.setdefault(name, {})
+        for kind, label in labels.items():
+            series.setdefault(kind, {})[label] = value
+        if not labels:
+            series["total"] = value
+
+    def observe(self, name, value, **labels):
+        """Add a value to a histogram."""
+        series = self._histograms.get(name)
+        if series is None:
+            series = self._histograms[name] = {"total": _Histogram()}
+        series["total"].observe(value)
+        for kind, label in labels.items():
+            by_value = series.setdefault(kind, {})
+            if label not in by_value:
+                by_value[label] = _Histogram()
+            by_value[label].observe(value)
+
+    def snapshot(self):
+        """return all metrics as plain data, for diagnostics."""
+        histograms = {}
+        for name, series in self._histograms.items():
+            histograms[name] = {
+                kind: item.as_dict()
+                if isinstance(item, _Histogram)
+                else {label: hist.as_dict() for label, hist in item.items()}
+                for kind, item in series.items()
+            }
+        return {
+            "counters": {
+                name: {
+                    kind: dict(item) if isinstance(item, dict) else item
+                    for kind, item in series.items()
+                }
+                for name, series in self._counters.items()
+            },
+            "gauges": {
+                name: {
+                    kind: dict(item) if isinstance(item, dict) else item
+                    for kind, item in series.items()
+                }
+                for name, series in self._gauges.items()
+            },
+            "histograms": histograms,
+        }
+
+    def reset(self):
+        """Clear all metrics."""
+        self._counters.clear()
+        self._gauges.clear()
+        self._histograms.clear()
+
+
+class _TargetBox:
+    """The target command of one blind being sent and the newest one waiting."""
+
+    def __init__(self, data, future):
+        """Init _TargetBox class."""
+        self.current = data
+        self.current_done = future
+        self.latest = None
+        self.latest_done = None
+        self.dropped = False
+
+
+class _SendScheduler:
+    """Pace the requests sent to one hub from its observed acks.
+
+    The gap between two sends shrinks while acks come back quickly and
+    grows when they slow down or get lost, between SEND_INTERVAL_MIN and
+    SEND_INTERVAL.
+    """
+
+    def __init__(self, send):
+        """Init _SendScheduler class."""
+        self._send = send
+        self._queue = deque()
+        self._urgent = deque()
+        self._task = None
+        self._next_send = 0
+        self.interval = SEND_INTERVAL_START
+        self.latency = None
+        self.best_latency = None
+
+    async def send(self, data, urgent=False):
+        """Queue data, return True once it has been sent or False if dropped.
+
+        Urgent data goes ahead of the other data already queued, in the
+        order it was queued.
+        """
+        loop = asyncio.get_running_loop()
+        sent = loop.create_future()
+        (self._urgent if urgent else self._queue).append((data, sent))
+        if self._task is None:
+            self._task = loop.create_task(self._run())
+        return await sent
+
+    def replace(self, msgid, payload):
+        """Change the data of a queued request, return False if already sent."""
+        for data, _ in self._queue + self._urgent:
+            if data["msgID"] == msgid:
+                data["data"] = payload
+                return True
+        return False
+
+    def drop(self, msgid):
+        """Remove a queued request, return False if already sent."""
+        for queue in (self._queue, self._urgent):
+            for item in queue:
+                if item[0]["msgID"] == msgid:
+                    queue.remove(item)
+                    if not item[1].done():
+                        item[1].set_result(False)
+                    return True
+        return False
+
+    def close(self):
+        """Stop sending, the queued requests count as dropped."""
+        if self._task is not None:
+            self._task.cancel()
+        for queue in (self._urgent, self._queue):
+            while queue:
+                _, sent = queue.popleft()
+                if not sent.done():
+                    sent.set_result(False)
+
+    async def _run(self):
+        """Send the queued requests one interval apart."""
+        try:
+            while self._urgent or self._queue:
+                wait = self._next_send - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+                data, sent = (self._urgent or self._queue).popleft()
+                if sent.done():
+                    continue
+                self._send(data)
+                self._next_send = time.monotonic() + self.interval
+                sent.set_result(True)
+        finally:
+            self._task = None
+
+    def ack_received(self, latency):
+        """Speed up while the latency stays close to the best seen."""
+        if self.best_latency is None or latency < self.best_latency:
+            self.best_latency = latency
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency = 0.8 * self.latency + 0.2 * latency
+        if self.latency > 2 * self.best_latency + SEND_INTERVAL_MIN:
+            self.interval = min(SEND_INTERVAL, self.interval * 1.25)
+        else:
+            self.interval = max(SEND_INTERVAL_MIN, self.interval * 0.9)
+
+    def ack_lost(self):
+        """Back off when a request gets no ack."""
+        self.interval = min(SEND_INTERVAL, self.interval * 2)
+
+
+def _group_socket(receive_port, group, interface):
+    """Return a blocking UDP socket on receive_port, in the group if multicast."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(("0.0.0.0", receive_port))
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 255)
+        if ipaddress.ip_address(group).is_multicast:
+            local = socket.inet_aton(interface or "0.0.0.0")
+            sock.setsockopt(
+                socket.IPPROTO_IP,
+                socket.IP_ADD_MEMBERSHIP,
+                socket.inet_aton(group) + local,
+            )
+            if interface is not None:
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, local)
+        sock.setblocking(True)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+class MulticastListener:
+    """One socket on the receive port shared by several ConnectorHub.
+
+    Each ConnectorHub started with async_start gets the datagrams sent from
+    its own hub IPs. The socket is opened when the first one starts and
+    closed when the last one stops.
+    """
+
+    def __init__(self, group=UDPIPADDRESS, receive_port=RECEIVEPORT, interface=None):
+        """Init MulticastListener class."""
+        self._group = group
+        self._receive_port = receive_port
+        self._interface = interface
+        self._socket = None
+        self._loop = None
+        self._clients = set()
+        self._routes = {}
+        self._buffer = bytearray(RECEIVEBUFFERSIZE)
+        self._view = memoryview(self._buffer)
+
+    def attach(self, client):
+        """Deliver the datagrams of the hub IPs of client, return if receiving."""
+        for ip in client.hub_ips:
+            if self._routes.setdefault(ip, client) is not client:
+                _LOGGER.warning("%s is already used by another ConnectorHub", ip)
+        self._clients.add(client)
+        if self._socket is None:
+            self._open()
+        return self._socket is not None
+
+    def detach(self, client):
+        """Stop delivering datagrams to client, closing the socket if unused."""
+        self._clients.discard(client)
+        for ip in [ip for ip, owner in self._routes.items() if owner is client]:
+            del self._routes[ip]
+        if not self._clients:
+            self._close()
+
+    def sendto(self, payload, address):
+        """Send a datagram from the shared socket."""
+        if self._socket is None:
+            raise OSError("The multicast listener is closed")
+        self._socket.sendto(payload, address)
+
+    def _open(self):
+        """Open the socket and read it on the running event loop."""
+        try:
+            sock = _group_socket(self._receive_port, self._group, self._interface)
+        except OSError as exc:
+            _LOGGER.error("Port is occupied: %s", exc)
+            return
+        sock.setblocking(False)
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(sock.fileno(), self._read_ready)
+        self._socket = sock
+        _LOGGER.info("Open port success")
+
+    def _close(self):
+        """Stop reading and close the socket."""
+        if self._socket is not None:
+            self._loop.remove_reader(self._socket.fileno())
+            self._socket.close()
+            self._socket = None
+
+    def _read_ready(self):
+        """Hand the datagrams waiting on the socket to their ConnectorHub."""
+        for _ in range(READBATCH):
+            try:
+                size, address = self._socket.recvfrom_into(self._buffer)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as exc:
+                if exc.errno in ICMPERRORS:
+                    _LOGGER.debug("Receive error: %s", exc)
+                    continue
+                _LOGGER.error("Receive failed: %s", exc)
+                self._close()
+                for client in list(self._clients):
+                    client._receive_failed.set()
+                return
+            client = self._routes.get(address[0])
+            if client is not None:
+                client._handle_datagram(self._view[:size], address)
+                continue
+            # each client counts what it drops, before parsing
+            for client in self._clients:
+                client._handle_datagram(self._view[:size], address)
+
+    @property
+    def clients(self):
+        """Return the number of ConnectorHub receiving through the socket."""
+        return len(self._clients)
 
 
 class ConnectorHub:
     """Main class."""
 
-    def __init__(self, ip, key):
-        """Init ConnectorHub class."""
+    def __init__(
+        self,
+        ip,
+        key,
+        send_address=UDPIPADDRESS,
+        send_port=SENDPORT,
+        receive_port=RECEIVEPORT,
+        interface=None,
+        unicast=False,
+        command_deadline=COMMAND_DEADLINE,
+        read_deadline=READ_DEADLINE,
+        listener=None,
+    ):
+        """Init ConnectorHub class.
+
+        send_address, send_port and receive_port only need changing to talk
+        to a hub simulator on a unicast or loopback address. interface is
+        the IPv4 address of the network interface to join the multicast
+        group on and send from, the one of the default route if None. With
+        unicast, requests to a device go to the IP of its hub once known,
+        and only discovery is sent to the multicast group. A command, or a
+        read of the state with operation 5, is resent until its ack arrives
+        or command_deadline, or read_deadline, seconds have passed. With a
+        MulticastListener as listener, async_start receives and sends through
+        its socket, shared with other ConnectorHub, instead of through a
+        listener of its own on receive_port and interface.
+        """
         self._ip = ip
+        self._hub_ips = frozenset(ip)
         self._key = key
+        self._send_address = (send_address, send_port)
+        self._receive_port = receive_port
+        self._interface = interface
+        self._unicast = unicast
+        self._listener = listener
+        self._command_deadline = command_deadline
+        self._read_deadline = read_deadline
         self._token = None
-        self._accesstoken = None
+        self._cipher = None
+        self._tokens = {}
+        self._refused = {}
+        self._bad_tokens = {}
         self._thread01 = None
         self._exit_thread = False
         self.any = "0.0.0.0"
-        self._device_list = {}
+        self._device_list = _Registry()
         self._listening = False
         self._mysocket = None
         self._isconnected = False
         self._errorcode = 1000
         self._test = 10
         self._need_read_devicelist = []
+        self._need_read_lock = Lock()
         self._readdevicelist_havedone = False
-        self._have_readdevice_thread = False
+        self._executor = None
+        self._acks_lock = Lock()
+        self._acks_waiting = {}
+        self._acks_busy = set()
+        self._device_list_acks = {}
+        self._answered_ips = set()
+        self._loop = None
+        self._receiving = False
+        self._buffer = bytearray(RECEIVEBUFFERSIZE)
+        self._view = memoryview(self._buffer)
+        self._pending = {}
+        self._recent = {}
+        self._schedulers = {}
+        self._targets = {}
+        self._tasks = set()
+        self._discovery_done = None
+        self._discovery_total = {}
+        self._discovery_waiting = {}
+        self._device_ips = {}
+        self._routes = _Registry()
+        self._unknown_devices = {}
+        self._topology_callbacks = []
+        self._connection_callbacks = []
+        self._events = _EventBroker()
+        self._supervisor = None
+        self._receive_failed = None
+        self._last_receive = 0
+        self._reading = set()
+        self._batch = []
+        self._probe = None
+        self._probe_done = None
+        self._probe_reads = {}
+        self._metrics = ConnectorMetrics()
 
     def _join_group_control(self):
         """Use it to join Group Control."""
         try:
-            self._mysocket = socket.socket(
-                socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP
+            self._mysocket = _group_socket(
+                self._receive_port, self._send_address[0], self._interface
             )
-            self._mysocket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self._mysocket.bind((self.any, RECEIVEPORT))
-            self._mysocket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 255)
-            self._mysocket.setsockopt(
-                socket.IPPROTO_IP,
-                socket.IP_ADD_MEMBERSHIP,
-                socket.inet_aton(UDPIPADDRESS) + socket.inet_aton(self.any),
-            )
-            self._mysocket.setblocking(True)
-            self._isconnected = True
-            self._isconnected = 1000
-        except OSError:
-            _LOGGER.error("Port is occupied")
-            self._mysocket.close()
-            self._isconnected = False
+            self._errorcode = 1000
+            self._set_connected(True)
+        except OSError as exc:
+            _LOGGER.error("Port is occupied: %s", exc)
+            self._mysocket = None
             self._errorcode = 1002
+            self._set_connected(False)
         else:
             _LOGGER.info("Open port success")
 
@@ -88,189 +804,1209 @@ class ConnectorHub:
             return None
         if self._key is None:
             return None
-        token_bytes = bytes(token, "utf-8")
-        key_bytes = bytes(self._key, "utf-8")
-        cipher = AES.new(key_bytes, AES.MODE_ECB)
-        encrypted_bytes = cipher.encrypt(token_bytes)
-        self._accesstoken = encrypted_bytes.hex().upper()
-        return self._accesstoken
+        if self._cipher is None:
+            self._cipher = AES.new(bytes(self._key, "utf-8"), AES.MODE_ECB)
+        return self._cipher.encrypt(bytes(token, "utf-8")).hex().upper()
+
+    def _hub_access_token(self, mac, token):
+        """Return the accessToken of a hub, derived again only for a new token."""
+        current = self._tokens.get(mac)
+        if current is None or current[0] != token:
+            if current is not None:
+                _LOGGER.info("Hub %s has a new token", mac)
+                self._metrics.count("token_rotated", hub=mac)
+            current = self._tokens[mac] = (token, self._get_access_token(token))
+            self._bad_tokens.pop(mac, None)
+        if mac in self._refused:
+            if self._refused.pop(mac) == token:
+                _LOGGER.error("Hub %s refuses the accessToken, check the key", mac)
+                self._bad_tokens[mac] = token
+            elif not self._refused and not self._bad_tokens:
+                self._errorcode = 1000
+        return current[1]
+
+    def _access_token_for(self, mac):
+        """Return the accessToken of the hub or wifi motor a device belongs to."""
+        current = self._tokens.get(mac) or self._tokens.get(mac[:12])
+        if current is None:
+            return None
+        return current[1]
+
+    def _access_token_refused(self, mac):
+        """Ask a hub for its token again after it refused our accessToken.
+
+        Requests waiting for an ack are resent with the new accessToken when
+        they time out. A hub that refuses the accessToken of a token it has
+        just sent again is not asked again until its token changes.
+        """
+        hub_mac = mac if mac in self._tokens else mac[:12]
+        self._metrics.count("errors", reason="access_token", hub=hub_mac)
+        self._errorcode = 1001
+        current = self._tokens.get(hub_mac)
+        token = None if current is None else current[0]
+        if hub_mac in self._refused or (
+            hub_mac in self._bad_tokens and self._bad_tokens[hub_mac] == token
+        ):
+            return
+        self._refused[hub_mac] = token
+        self._device_list_acks.pop(hub_mac, None)
+        _LOGGER.info("Hub %s refused the accessToken, reading its token", hub_mac)
+        self.get_device_list()
+
+    def _set_connected(self, connected):
+        """Record the connection state and tell the connection callbacks."""
+        if connected == self._isconnected:
+            return
+        self._isconnected = connected
+        self._metrics.gauge("connected", int(connected))
+        for func in list(self._connection_callbacks):
+            func(connected)
+
+    def subscribe(self, func, mac=None, msg_types=None, fields=None, executor=None):
+        """Call func with a DeviceEvent for each update of a device.
+
+        mac limits the events to those of one blind or wifi motor, or to
+        the blinds of one hub, msg_types to messages such as "Report" and
+        fields to changes of "position", "angle" or "last_error". func is
+        called on the event loop subscribe was called from, on executor if
+        one is given, otherwise in the thread receiving the message.
+        Return a function which unsubscribes.
+        """
+        return self._events.subscribe(func, mac, msg_types, fields, executor)
+
+    def register_connection_callback(self, func):
+        """register a callback told True or False as receiving starts or stops."""
+        self._connection_callbacks.append(func)
+
+    def remove_connection_callback(self, func):
+        """remove a connection callback."""
+        self._connection_callbacks.remove(func)
 
     def _receive_data(self):
-        """Receive data from udp group port."""
+        """Receive data from udp group port, joining again after an error."""
+        delay = RECONNECT_DELAY
         while not self._exit_thread:
             try:
-                data, address = self._mysocket.recvfrom(4096)
-                data_json = json.loads(data.decode("UTF-8"))
-                if address[0] in self._ip:
-                    msg_type = data_json["msgType"]
-                    if "actionResult" in data_json:
-                        if data_json["actionResult"] == "AccessToken error":
-                            self._errorcode = 1001
-                            break
-                    if msg_type == "Report":
-                        self._report(data_json)
-                    elif msg_type == "GetDeviceListAck":
-                        t = Thread(
-                            target=self._get_devicelist_ack, kwargs={"data": data_json}
-                        )
-                        t.start()
-                    elif msg_type == "ReadDeviceAck":
-                        self._read_deviceack(data_json)
-                    elif msg_type == "WriteDeviceAck":
-                        self._write_deviceack(data_json)
-                else:
-                    _LOGGER.info("This message is not in the IP list")
-            except OSError:
-                _LOGGER.error("Port is occupied")
+                size, address = self._mysocket.recvfrom_into(self._buffer)
+            except (OSError, AttributeError) as exc:
+                if self._exit_thread:
+                    break
+                if getattr(exc, "errno", None) in ICMPERRORS:
+                    continue
+                _LOGGER.error("Receive failed, joining again in %s s", delay)
                 self._errorcode = 1002
-                self._isconnected = False
-                break
+                self._set_connected(False)
+                if self._mysocket is not None:
+                    self._mysocket.close()
+                    self._mysocket = None
+                time.sleep(delay)
+                delay = min(delay * 2, RECONNECT_DELAY_MAX)
+                if not self._exit_thread:
+                    self._metrics.count("reconnects")
+                    self._join_group_control()
+                    if self._isconnected:
+                        self.get_device_list()
+                continue
+            delay = RECONNECT_DELAY
+            if address is None:
+                continue
+            self._handle_datagram(self._view[:size], address)
+
+    def _decode(self, data):
+        """Decode a datagram, return None if it is not a json message."""
+        start = time.perf_counter()
+        try:
+            data_json = _loads(data)
+        except ValueError:
+            data_json = None
+        if not isinstance(data_json, dict) or "msgType" not in data_json:
+            _LOGGER.debug("Discard message which is not json")
+            self._metrics.count("dropped", reason="not_json")
+            return None
+        self._metrics.observe(
+            "parse_time", time.perf_counter() - start, msgType=data_json["msgType"]
+        )
+        return data_json
+
+    def _handle_datagram(self, data, address):
+        """Deal with a datagram, dropping those of other hosts before parsing.
+
+        data may be a view of the receive buffer, valid only during the call.
+        """
+        if address[0] not in self._hub_ips:
+            _LOGGER.debug("This message is not in the IP list")
+            self._metrics.count("dropped", reason="unknown_ip")
+            return
+        self._last_receive = time.monotonic()
+        data_json = self._decode(data)
+        if data_json is None:
+            return
+        self._handle_message(data_json, address)
+
+    def _open_endpoint(self):
+        """Receive through the listener on the event loop, return if it worked.
+
+        Without a shared MulticastListener, a private one is made for the
+        group, receive_port and interface of this ConnectorHub.
+        """
+        if self._listener is None:
+            self._listener = MulticastListener(
+                group=self._send_address[0],
+                receive_port=self._receive_port,
+                interface=self._interface,
+            )
+        if not self._listener.attach(self):
+            self._listener.detach(self)
+            self._errorcode = 1002
+            self._set_connected(False)
+            return False
+        self._errorcode = 1000
+        self._receiving = True
+        self._last_receive = time.monotonic()
+        return True
+
+    def _close_endpoint(self):
+        """Stop receiving on the event loop."""
+        if not self._receiving:
+            return
+        self._receiving = False
+        self._listener.detach(self)
+
+    def _send_payload(self, payload, address):
+        """Send a datagram on the event loop."""
+        if not self._receiving:
+            self._metrics.count("dropped", reason="not_connected")
+            return
+        try:
+            self._listener.sendto(payload, address)
+        except OSError as exc:
+            self._metrics.count("errors", reason="send")
+            _LOGGER.warning("Send failed: %s", exc)
+
+    async def _async_supervise(self):
+        """Keep receiving, and find the hubs again once they are lost.
+
+        When reading the socket fails, it is rebuilt with exponential
+        backoff. When the hubs stop answering, the socket stays open and
+        they are asked again with exponential backoff.
+
+        Once the hubs answer again, the blinds that have not reported since
+        the connection was lost are polled. The device list they send reads
+        any blind added meanwhile.
+        """
+        failed = not self._receiving
+        while True:
+            if self._isconnected:
+                failed = await self._async_watch()
+            lost_at = self._last_receive
+            self._set_connected(False)
+            if failed:
+                _LOGGER.warning("Receiving failed, joining the group again")
+            else:
+                _LOGGER.warning("No hub answers, asking again")
+            await self._async_recover(failed)
+            self._set_connected(True)
+            self._create_task(
+                self.async_update_devices(max_age=time.monotonic() - lost_at)
+            )
+
+    async def _async_watch(self):
+        """Return True once reading the socket fails, False once no hub answers.
+
+        When nothing was received for WATCHDOG_INTERVAL the hubs are asked
+        for their device list up to DISCOVERY_REQUESTS times.
+        """
+        while True:
+            try:
+                await asyncio.wait_for(self._receive_failed.wait(), WATCHDOG_INTERVAL)
+                return True
+            except asyncio.TimeoutError:
+                pass
+            if time.monotonic() - self._last_receive < WATCHDOG_INTERVAL:
+                continue
+            for _ in range(DISCOVERY_REQUESTS):
+                if await self._async_ask_hubs():
+                    break
+                if self._receive_failed.is_set():
+                    return True
+            else:
+                return False
+
+    async def _async_recover(self, failed):
+        """Return once a hub answers, rebuilding the socket while reading it fails."""
+        delay = RECONNECT_DELAY
+        while True:
+            if failed:
+                self._close_endpoint()
+                self._errorcode = 1002
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_DELAY_MAX)
+            if failed:
+                self._metrics.count("reconnects")
+                self._receive_failed.clear()
+                if not self._open_endpoint():
+                    continue
+                _LOGGER.info("Receiving again on port %s", self._receive_port)
+            if await self._async_ask_hubs():
+                return
+            failed = self._receive_failed.is_set()
+
+    async def _async_ask_hubs(self):
+        """Ask the hubs for their device list, return if one answered."""
+        asked = time.monotonic()
+        self.get_device_list()
+        try:
+            await asyncio.wait_for(self._receive_failed.wait(), PROBE_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+        return self._last_receive >= asked
+
+    def _create_task(self, coro):
+        """Run a coroutine in a task kept until it is done."""
+        task = self._loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _handle_message(self, data_json, address):
+        """Dispatch a received message."""
+        msg_type = data_json["msgType"]
+        mac = data_json.get("mac", "")
+        self._metrics.count("received", msgType=msg_type, hub=mac[:12], device=mac)
+        if self._probe is not None:
+            self._probe_message(data_json, address[0])
+            return
+        if data_json.get("actionResult") == "AccessToken error":
+            self._access_token_refused(mac)
+            return
+        if "msgID" in data_json and self._is_duplicate(msg_type, mac, data_json):
+            return
+        if self._pending and msg_type.endswith("Ack"):
+            self._resolve_pending(data_json)
+        if msg_type == "Report":
+            self._report(data_json)
+        elif msg_type == "GetDeviceListAck":
+            if self._is_repeated_device_list(data_json):
+                return
+            if self._loop is None:
+                self._queue_devicelist_ack(data_json, address[0])
+            else:
+                self._get_devicelist_ack(data_json, address[0])
+        elif msg_type == "ReadDeviceAck":
+            self._read_deviceack(data_json)
+        elif msg_type == "WriteDeviceAck":
+            self._write_deviceack(data_json)
+
+    def _is_repeated_device_list(self, data):
+        """Return if a hub sent the same device list and token just before.
+
+        Every GetDeviceList is answered by every hub, so the acks of
+        requests sent close together only differ by msgID.
+        """
+        now = time.monotonic()
+        content = (data.get("token"), [item["mac"] for item in data["data"]])
+        last = self._device_list_acks.get(data["mac"])
+        self._device_list_acks[data["mac"]] = (content, now)
+        if last is not None and last[0] == content:
+            if now - last[1] < REPEATED_ACK_INTERVAL:
+                self._metrics.count("dropped", reason="repeated_device_list")
+                return True
+        return False
+
+    def _queue_devicelist_ack(self, data, ip):
+        """Handle a GetDeviceListAck in the worker pool, the newest per hub.
+
+        The acks of one hub are handled one after the other, by one worker.
+        """
+        mac = data["mac"]
+        with self._acks_lock:
+            self._acks_waiting[mac] = (data, ip)
+            if mac in self._acks_busy:
+                return
+            self._acks_busy.add(mac)
+        if (executor := self._executor) is not None:
+            executor.submit(self._run_devicelist_ack, mac)
+
+    def _run_devicelist_ack(self, mac):
+        """Handle the newest GetDeviceListAck of a hub until none is waiting."""
+        while True:
+            with self._acks_lock:
+                if mac not in self._acks_waiting:
+                    self._acks_busy.discard(mac)
+                    return
+                data, ip = self._acks_waiting.pop(mac)
+            try:
+                self._get_devicelist_ack(data, ip)
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Handling the device list of %s failed", mac)
+
+    def _is_duplicate(self, msg_type, mac, data):
+        """Return if the message was received already, remembering it if not.
+
+        A hub answers a resent request with another ack of the same msgID.
+        """
+        key = (msg_type, mac, data["msgID"])
+        if key in self._recent:
+            self._metrics.count("dropped", reason="duplicate")
+            return True
+        self._recent[key] = None
+        if len(self._recent) > RECENT_MESSAGES:
+            del self._recent[next(iter(self._recent))]
+        return False
+
+    def _resolve_pending(self, data):
+        """Complete the request this ack answers.
+
+        An ack without a msgID answers the oldest request of its kind sent
+        to the same device, one with an unknown msgID answers none of ours.
+        """
+        msgid = data.get("msgID")
+        if msgid is None:
+            for key, item in self._pending.items():
+                if (
+                    item.sent_at is not None
+                    and item.ack_type == data["msgType"]
+                    and item.data.get("mac") == data.get("mac")
+                ):
+                    msgid = key
+                    break
+        request = self._pending.get(msgid)
+        if request is None or request.sent_at is None:
+            return
+        del self._pending[msgid]
+        request.latency = time.monotonic() - request.sent_at
+        if not request.future.done():
+            request.future.set_result(data)
+
+    async def _async_request(self, data, ack_type, timeout=REQUEST_TIMEOUT):
+        """Send a request and wait for its ack, resending until the deadline.
+
+        The wait for the ack starts at timeout and doubles with each resend,
+        up to REQUEST_TIMEOUT_MAX plus some jitter. A newer target command
+        of a blind replaces the one of the same kind still queued, or stops
+        the resends of the one already sent and goes out next. A move
+        operation drops the targets still waiting and goes ahead of the
+        queue. Return the ack, or None when the request was dropped.
+        """
+        if self._loop is None:
+            raise RuntimeError("async_start must be called before requests")
+        urgent = False
+        if data["msgType"] == "WriteDevice":
+            for field in TARGETFIELDS:
+                if field in data["data"]:
+                    return await self._async_send_target(data, field, ack_type, timeout)
+            if data["data"].get("operation") in MOVEOPERATIONS:
+                self._drop_targets(data["mac"])
+                urgent = True
+        return await self._async_send_request(data, ack_type, timeout, urgent)
+
+    async def _async_send_target(self, data, field, ack_type, timeout):
+        """Send a target command, coalescing it with those of the same blind."""
+        key = (data["mac"], field)
+        box = self._targets.get(key)
+        if box is None:
+            box = self._targets[key] = _TargetBox(data, self._loop.create_future())
+            self._create_task(self._async_run_targets(key, box, ack_type, timeout))
+            return await asyncio.shield(box.current_done)
+        self._metrics.count("coalesced", hub=data["mac"][:12], device=data["mac"])
+        if self._scheduler(data["mac"]).replace(box.current["msgID"], data["data"]):
+            return await asyncio.shield(box.current_done)
+        self._drop_request(box.current["msgID"])
+        if box.latest is None:
+            box.latest = data
+            box.latest_done = self._loop.create_future()
+        else:
+            box.latest["data"] = data["data"]
+        return await asyncio.shield(box.latest_done)
+
+    async def _async_run_targets(self, key, box, ack_type, timeout):
+        """Send the target commands of a blind one after the other."""
+        try:
+            while box.current is not None and not box.dropped:
+                try:
+                    ack = await self._async_send_request(box.current, ack_type, timeout)
+                except Exception as exc:  # pylint: disable=broad-except
+                    if not box.current_done.done():
+                        box.current_done.set_exception(exc)
+                else:
+                    if not box.current_done.done():
+                        box.current_done.set_result(ack)
+                box.current, box.current_done = box.latest, box.latest_done
+                box.latest = box.latest_done = None
+        finally:
+            if self._targets.get(key) is box:
+                del self._targets[key]
+            for done in (box.current_done, box.latest_done):
+                if done is not None and not done.done():
+                    done.set_result(None)
+
+    def _drop_targets(self, mac):
+        """Drop the target commands of a blind, sent or not.
+
+        The box goes at once, so that a target whose sender has not run yet
+        is not sent after the move operation which dropped it.
+        """
+        for field in TARGETFIELDS:
+            box = self._targets.pop((mac, field), None)
+            if box is None:
+                continue
+            box.dropped = True
+            self._scheduler(mac).drop(box.current["msgID"])
+            self._drop_request(box.current["msgID"])
+            for done in (box.current_done, box.latest_done):
+                if done is not None and not done.done():
+                    done.set_result(None)
+            box.latest = box.latest_done = None
+
+    def _drop_request(self, msgid):
+        """Stop resending a request, which then returns None."""
+        if (request := self._pending.get(msgid)) is not None:
+            request.dropped = True
+            if not request.future.done():
+                request.future.set_result(None)
+
+    def _deadline(self, data):
+        """Return how long to keep resending a request."""
+        if data["data"].get("operation") == 5:
+            return self._read_deadline
+        return self._command_deadline
+
+    async def _async_send_request(self, data, ack_type, timeout, urgent=False):
+        """Send a request through the hub scheduler and wait for its ack."""
+        request = _PendingRequest(data, ack_type, self._loop.create_future())
+        self._pending[data["msgID"]] = request
+        scheduler = self._scheduler(data["mac"])
+        deadline = self._deadline(data)
+        give_up = time.monotonic() + deadline
+        try:
+            while not request.dropped:
+                left = give_up - time.monotonic()
+                if left <= 0:
+                    break
+                request.attempts += 1
+                if "AccessToken" in data:
+                    data["AccessToken"] = self._access_token_for(data["mac"])
+                if not await scheduler.send(data, urgent):
+                    self._metrics.count("superseded", hub=data["mac"][:12])
+                    return None
+                request.sent_at = time.monotonic()
+                wait = min(timeout * 2 ** (request.attempts - 1), REQUEST_TIMEOUT_MAX)
+                wait *= 1 + random.uniform(0, RETRY_JITTER)
+                try:
+                    ack = await asyncio.wait_for(
+                        asyncio.shield(request.future),
+                        max(min(wait, give_up - request.sent_at), 0),
+                    )
+                except asyncio.TimeoutError:
+                    _LOGGER.debug(
+                        "No %s for %s, attempt %s",
+                        ack_type,
+                        data["msgID"],
+                        request.attempts,
+                    )
+                    self._metrics.count(
+                        "ack_lost", hub=data["mac"][:12], device=data["mac"]
+                    )
+                    scheduler.ack_lost()
+                    self._metrics.gauge(
+                        "send_interval", scheduler.interval, hub=data["mac"][:12]
+                    )
+                    continue
+                if request.dropped:
+                    break
+                scheduler.ack_received(request.latency)
+                self._metrics.observe(
+                    "ack_latency",
+                    request.latency,
+                    msgType=ack_type,
+                    hub=data["mac"][:12],
+                    device=data["mac"],
+                )
+                self._metrics.gauge(
+                    "send_interval", scheduler.interval, hub=data["mac"][:12]
+                )
+                if request.attempts > 1:
+                    self._metrics.count(
+                        "retried", request.attempts - 1, hub=data["mac"][:12]
+                    )
+                _LOGGER.debug(
+                    "%s for %s in %.3f s", ack_type, data["msgID"], request.latency
+                )
+                self._set_device_error(data["mac"], None, ack_type)
+                return ack
+            if request.dropped:
+                return None
+            self._metrics.count("timeouts", hub=data["mac"][:12], device=data["mac"])
+            self._set_device_error(
+                data["mac"], f"No {ack_type} after {request.attempts} attempts"
+            )
+            raise asyncio.TimeoutError(f"No {ack_type} for {data['msgID']}")
+        finally:
+            self._pending.pop(data["msgID"], None)
+
+    def _set_device_error(self, mac, error, msg_type=None):
+        """Record the outcome of the last request to a device."""
+        device = self._routes.get(mac)
+        if device is None or device.last_error == error:
+            return
+        device.set_error(error)
+        self._events.publish(device, msg_type, _ERROR_CHANGED)
+
+    def _scheduler(self, mac):
+        """Return the send scheduler of the hub the device belongs to."""
+        hub_mac = mac[:12]
+        if hub_mac not in self._schedulers:
+            self._schedulers[hub_mac] = _SendScheduler(self._send_data)
+        return self._schedulers[hub_mac]
+
+    def _destination(self, data):
+        """Return the address to send a message to."""
+        if self._unicast and "mac" in data:
+            ip = self._device_ips.get(data["mac"]) or self._device_ips.get(
+                data["mac"][:12]
+            )
+            if ip is not None:
+                return (ip, self._send_address[1])
+        return self._send_address
 
     def _send_data(self, data):
         """Send data to UDP Port."""
+        if "mac" in data:
+            self._metrics.count("sent", msgType=data["msgType"], hub=data["mac"][:12])
+        else:
+            self._metrics.count("sent", msgType=data["msgType"])
+        address = self._destination(data)
+        if self._receiving:
+            payload = bytes(json.dumps(data), "utf-8")
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+            if running is self._loop:
+                self._send_payload(payload, address)
+            else:
+                self._loop.call_soon_threadsafe(self._send_payload, payload, address)
+            return
+        if self._loop is not None:
+            self._metrics.count("dropped", reason="not_connected")
+            _LOGGER.debug("Not receiving, %s is not sent", data["msgType"])
+            return
         try:
-            self._mysocket.sendto(
-                bytes(json.dumps(data), "utf-8"), (UDPIPADDRESS, SENDPORT)
-            )
+            self._mysocket.sendto(bytes(json.dumps(data), "utf-8"), address)
         except socket.timeout:
             _LOGGER.warning("Send data time out")
         except OSError:
-            self._isconnected = False
             self._errorcode = 1002
+            self._set_connected(False)
             _LOGGER.warning("Send port is occupied")
         except AttributeError:
             _LOGGER.warning("Socket object is none")
 
-    def _get_devicelist_ack(self, data):
+    def _get_devicelist_ack(self, data, ip=None):
         """Deal with GetDeviceListAck message."""
-        self._get_access_token(data["token"])
-        if data["deviceType"] in WIFIMOTORTYPE:
-            self._device_list[data["mac"]] = TwoWayBlind(
-                mac=data["mac"],
-                accesstoken=self._accesstoken,
-                devicetype=data["deviceType"],
-                func=self._send_data,
-            )
+        access_token = self._hub_access_token(data["mac"], data["token"])
+        device = self._device_list.get(data["mac"])
+        if ip is not None:
+            self._device_ips[data["mac"]] = ip
+            self._answered_ips.add(ip)
+        if device is not None:
+            device.set_access_token(access_token)
+            if isinstance(device, Hub):
+                device.set_version(data["fwVersion"])
+                listed = {item["mac"] for item in data["data"]}
+                removed = [mac for mac in device.blinds_list if mac not in listed]
+                for mac in removed:
+                    device.remove_blind(mac)
+                if removed:
+                    self._run_topology_callback([], removed)
         else:
-            self._device_list[data["mac"]] = Hub(
-                mac=data["mac"],
-                version=data["fwVersion"],
-                token=data["token"],
-                access_token=self._accesstoken,
-                devicetype=data["deviceType"],
-                func=self._send_data,
+            if data["deviceType"] in WIFIMOTORTYPE:
+                device = TwoWayBlind(
+                    mac=data["mac"],
+                    accesstoken=access_token,
+                    devicetype=data["deviceType"],
+                    func=self._send_data,
+                    request=self._async_request,
+                    events=self._events,
+                )
+            else:
+                device = Hub(
+                    mac=data["mac"],
+                    version=data["fwVersion"],
+                    token=data["token"],
+                    access_token=access_token,
+                    devicetype=data["deviceType"],
+                    func=self._send_data,
+                    request=self._async_request,
+                    routes=self._routes,
+                    events=self._events,
+                )
+            if self._device_list.setdefault(data["mac"], device) is device:
+                if isinstance(device, TwoWayBlind):
+                    self._routes.set(data["mac"], device)
+                self._run_topology_callback([device], [])
+        if self._loop is not None:
+            self._start_hub_discovery(data)
+            return
+        with self._need_read_lock:
+            for item in data["data"]:
+                if (
+                    item["deviceType"] in BLINDSDEVICETYPE
+                    and item not in self._need_read_devicelist
+                ):
+                    self._need_read_devicelist.append(item)
+
+    def _start_hub_discovery(self, data):
+        """Read the blinds listed by a hub as soon as it answers."""
+        hub_mac = data["mac"]
+        items = [
+            item for item in data["data"] if item["deviceType"] in BLINDSDEVICETYPE
+        ]
+        if hub_mac in self._discovery_total:
+            known = self._device_list[hub_mac].blinds_list
+            items = [
+                item
+                for item in items
+                if item["mac"] not in known and item["mac"] not in self._reading
+            ]
+            self._read_devices(items)
+            return
+        self._discovery_total[hub_mac] = len(items)
+        self._discovery_waiting[hub_mac] = {item["mac"] for item in items}
+        self._read_devices(items)
+        self._check_discovery()
+
+    def _read_devices(self, items):
+        """Start reading the listed blinds, unless they are being read."""
+        if not items:
+            return
+        self._reading.update(item["mac"] for item in items)
+        self._create_task(self._async_read_devices(items))
+
+    async def _async_read_devices(self, items):
+        """Read the listed blinds, each hub paced by its own scheduler."""
+        await asyncio.gather(*(self._async_read_device(item) for item in items))
+
+    async def _async_read_device(self, item):
+        """Read one listed blind."""
+        try:
+            await self._async_get_device_info(
+                mac=item["mac"], devicetype=item["deviceType"]
             )
-        for item in data["data"]:
-            if item["deviceType"] in BLINDSDEVICETYPE:
-                self._need_read_devicelist.append(item)
-        if not self._have_readdevice_thread:
-            t = Timer(3, self.read_devicelist)
-            t.start()
-            self._have_readdevice_thread = True
+        except asyncio.TimeoutError:
+            _LOGGER.warning("Read device %s time out", item["mac"])
+            self._discovery_answered(item["mac"])
+        finally:
+            self._reading.discard(item["mac"])
+
+    def _discovery_answered(self, mac):
+        """Mark a listed blind as answered."""
+        waiting = self._discovery_waiting.get(mac[:12])
+        if waiting and mac in waiting:
+            waiting.discard(mac)
+            self._check_discovery()
+
+    def _check_discovery(self):
+        """Finish discovery once every hub and its blinds have answered."""
+        if self._discovery_done is None or self._discovery_done.is_set():
+            return
+        if len(self._discovery_total) < len(set(self._ip)):
+            return
+        if any(self._discovery_waiting.values()):
+            return
+        self._readdevicelist_havedone = True
+        self._discovery_done.set()
+
+    def _hubs_answered(self):
+        """Return if every hub has sent its device list."""
+        return self._answered_ips.issuperset(self._ip)
+
+    def _read_devicelist_later(self):
+        """Wait for the other hubs, asking them again, then read the blinds."""
+        for _ in range(DISCOVERY_REQUESTS):
+            time.sleep(DISCOVERY_RESEND)
+            if self._hubs_answered() or self._exit_thread:
+                break
+            self.get_device_list()
+        self.read_devicelist()
+
+    async def _async_discover(self):
+        """Ask for the device list, again while some hub has not answered."""
+        for _ in range(DISCOVERY_REQUESTS):
+            self.get_device_list()
+            await asyncio.sleep(DISCOVERY_RESEND)
+            if self._hubs_answered():
+                return
 
     def read_devicelist(self):
+        """Read the listed blinds which have not answered, three times at most."""
         count = 0
-        while len(self._need_read_devicelist) != 0 and count < 3:
-            for item in self._need_read_devicelist:
+        while count < 3:
+            with self._need_read_lock:
+                items = list(self._need_read_devicelist)
+            if not items:
+                break
+            for item in items:
+                if self._exit_thread:
+                    return
                 self._get_device_info(mac=item["mac"], devicetype=item["deviceType"])
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                loop.run_until_complete(delay(0.5))
-                loop.close()
+                time.sleep(SEND_INTERVAL)
             count += 1
         self._readdevicelist_havedone = True
 
     def _read_deviceack(self, data):
         """Deal with ReadDeviceAck message."""
-        hub_mac = data["mac"][:12]
-        self._device_list[hub_mac].add_blinds(data)
+        self._add_blind(data)
+        self._discovery_answered(data["mac"])
 
     def _write_deviceack(self, data):
         """Deal with WriteDeviceAck message"""
-        hub_mac = data["mac"][:12]
-        self._device_list[hub_mac].add_blinds(data)
-        if self._need_read_devicelist:
-            try:
-                self._need_read_devicelist.remove(
-                    {"mac": data["mac"], "deviceType": data["deviceType"]}
+        if data["deviceType"] in WIFIMOTORTYPE:
+            device = self._device_list.get(data["mac"])
+            if device is not None and "currentPosition" in data.get("data", {}):
+                changed = device.set_state(
+                    data["data"]["currentPosition"], data["data"]["currentAngle"]
                 )
-            except ValueError:
-                _LOGGER.warning("Remove device not in list")
+                self._events.publish(device, "WriteDeviceAck", changed, data)
+            return
+        self._add_blind(data)
+        self._discovery_answered(data["mac"])
+        if self._need_read_devicelist:
+            with self._need_read_lock:
+                try:
+                    self._need_read_devicelist.remove(
+                        {"mac": data["mac"], "deviceType": data["deviceType"]}
+                    )
+                except ValueError:
+                    _LOGGER.debug("Remove device not in list")
+
+    def _add_blind(self, data):
+        """Add or update the blind in an ack and tell the topology callbacks."""
+        hub = self._device_list[data["mac"][:12]]
+        old, new = hub.add_blinds(data)
+        if isinstance(new, TwoWayBlind) and "currentPosition" in data["data"]:
+            changed = new.set_state(
+                data["data"]["currentPosition"], data["data"]["currentAngle"]
+            )
+            if new is old:
+                self._events.publish(new, data["msgType"], changed, data)
+        if new is not old:
+            self._run_topology_callback(
+                [] if new is None else [new], [] if old is None else [old.mac]
+            )
 
-    def _report(self, data):
-        """return the hub mac."""
-        if data["deviceType"] in WIFIMOTORTYPE:
-            mac = data["mac"]
-            current_position = data["data"]["currentPosition"]
-            current_angle = data["data"]["currentAngle"]
-            self._device_list[mac].set_angle(current_angle)
-            self._device_list[mac].set_position(current_position)
-            self._device_list[mac].run_callback()
-        else:
-            hub_mac = data["mac"][:12]
-            blind_mac = data["mac"]
-            if "wirelessMode" in data["data"]:
-                if data["data"]["wirelessMode"] in TWOWAYWIRELESSMODE:
-                    current_position = data["data"]["currentPosition"]
-                    current_angle = data["data"]["currentAngle"]
-                    try:
-                        self._device_list[hub_mac].blinds_list[blind_mac].set_angle(
-                            current_angle
-                        )
-                        self._device_list[hub_mac].blinds_list[blind_mac].set_position(
-                            current_position
-                        )
-                        self._device_list[hub_mac].blinds_list[blind_mac].run_callback()
-                    except KeyError:
-                        _LOGGER.warning(
-                            "This motor is a newly added motor in the APP and is not synchronized to HA"
+    def register_topology_callback(self, func):
+        """register a callback for added and removed devices."""
+        self._topology_callbacks.append(func)
+
+    def remove_topology_callback(self, func):
+        """remove a topology callback."""
+        self._topology_callbacks.remove(func)
+
+    def _run_topology_callback(self, added, removed):
+        """run the topology callbacks with the added devices and removed macs."""
+        for func in list(self._topology_callbacks):
+            func(added, removed)
+
+    def topology(self):
+        """Return the known devices in a form that can be stored as json."""
+        devices = {}
+        for mac, device in self._device_list.items():
+            item = {"ip": self._device_ips.get(mac), "deviceType": device.devicetype}
+            if isinstance(device, Hub):
+                item["fwVersion"] = device.hub_version
+                item["blinds"] = {
+                    blind.mac: _blind_topology(blind)
+                    for blind in device.blinds_list.values()
+                }
+            else:
+                item.update(_blind_topology(device))
+            devices[mac] = item
+        return {"devices": devices}
+
+    def load_topology(self, data):
+        """Create the devices stored by topology() before discovering them."""
+        devices = {}
+        try:
+            for mac, item in data["devices"].items():
+                if item["ip"] not in self._ip:
+                    continue
+                if item["deviceType"] in WIFIMOTORTYPE:
+                    device = TwoWayBlind(
+                        mac=mac,
+                        accesstoken=None,
+                        devicetype=item["deviceType"],
+                        blind_type=item["type"],
+                        position=item["position"],
+                        angle=item["angle"],
+                        func=self._send_data,
+                        request=self._async_request,
+                        events=self._events,
+                    )
+                    self._routes.set(mac, device)
+                else:
+                    device = Hub(
+                        mac=mac,
+                        version=item["fwVersion"],
+                        token=None,
+                        access_token=None,
+                        devicetype=item["deviceType"],
+                        func=self._send_data,
+                        request=self._async_request,
+                        routes=self._routes,
+                        events=self._events,
+                    )
+                    for blind_mac, blind in item["blinds"].items():
+                        device.add_blinds(
+                            {
+                                "mac": blind_mac,
+                                "deviceType": blind["deviceType"],
+                                "data": {
+                                    "wirelessMode": blind["wirelessMode"],
+                                    "type": blind["type"],
+                                    "currentPosition": blind.get("position", 0),
+                                    "currentAngle": blind.get("angle", 0),
+                                },
+                            }
                         )
+                devices[mac] = device
+                self._device_ips[mac] = item["ip"]
+            self._device_list.update(devices)
+        except (KeyError, TypeError, AttributeError):
+            _LOGGER.warning("Stored device list is invalid, discovering all devices")
+            self._device_list.clear()
+            self._device_ips.clear()
+            self._routes.clear()
 
-    def _get_device_info(self, mac, devicetype):
-        """Get device info."""
-        data = {
+    def _report(self, data):
+        """Route a Report to its blind or wifi motor."""
+        device = self._routes.get(data["mac"])
+        if device is None:
+            self._unknown_device(data["mac"])
+            return
+        state = data["data"]
+        if isinstance(device, TwoWayBlind) and "currentPosition" in state:
+            changed = device.set_state(state["currentPosition"], state["currentAngle"])
+            self._events.publish(device, "Report", changed, data)
+
+    def _unknown_device(self, mac):
+        """Count a Report of an unknown device, warning once in a while."""
+        self._metrics.count("dropped", reason="unknown_device")
+        now = time.monotonic()
+        last = self._unknown_devices.get(mac)
+        if last is not None and now - last < UNKNOWN_DEVICE_WARN_INTERVAL:
+            return
+        self._unknown_devices[mac] = now
+        _LOGGER.warning(
+            "Motor %s is a newly added motor in the APP and is not synchronized to HA",
+            mac,
+        )
+
+    def _device_info_request(self, mac, devicetype):
+        """Build the message that reads a device."""
+        return {
             "msgType": "WriteDevice",
             "msgID": get_msgid(),
             "deviceType": devicetype,
             "mac": mac,
-            "AccessToken": self._accesstoken,
+            "AccessToken": self._access_token_for(mac),
             "data": {"operation": 5},
         }
-        self._send_data(data)
+
+    def _get_device_info(self, mac, devicetype):
+        """Get device info."""
+        self._send_data(self._device_info_request(mac, devicetype))
+
+    async def _async_get_device_info(self, mac, devicetype):
+        """Get device info and return the ack."""
+        return await self._async_request(
+            self._device_info_request(mac, devicetype), "WriteDeviceAck"
+        )
+
+    async def async_probe(self, timeout=PROBE_TIMEOUT):
+        """Check each hub IP and the key without reading every blind.
+
+        Every hub is asked for its device list, then one listed blind is read
+        to check the accessToken. Return a dict of IP to PROBE_OK,
+        PROBE_KEY_ERROR when the hub refuses the accessToken,
+        PROBE_UNVERIFIED when the hub answered but the blind did not,
+        PROBE_NO_ANSWER, or PROBE_PORT_ERROR when the port cannot be opened.
+        """
+        if self._listening:
+            raise RuntimeError("async_probe cannot be used after starting")
+        self._loop = asyncio.get_running_loop()
+        self._receive_failed = asyncio.Event()
+        try:
+            if not self._open_endpoint():
+                return {ip: PROBE_PORT_ERROR for ip in self._ip}
+            self._probe = {ip: PROBE_NO_ANSWER for ip in self._ip}
+            self._probe_done = asyncio.Event()
+            reads = {}
+            for _ in range(PROBE_REQUESTS):
+                if PROBE_NO_ANSWER in self._probe.values():
+                    self.get_device_list()
+                for ip, (mac, devicetype) in reads.items():
+                    if self._probe[ip] == PROBE_UNVERIFIED:
+                        self._get_device_info(mac=mac, devicetype=devicetype)
+                reads = self._probe_reads
+                try:
+                    await asyncio.wait_for(
+                        self._probe_done.wait(), timeout / PROBE_REQUESTS
+                    )
+                except asyncio.TimeoutError:
+                    continue
+                break
+            return dict(self._probe)
+        finally:
+            self._probe = None
+            self._probe_reads = {}
+            self._close_endpoint()
+            self._loop = None
+
+    def _probe_message(self, data, ip):
+        """Deal with a message received while probing."""
+        if data.get("actionResult") == "AccessToken error":
+            self._probe_result(data["mac"], PROBE_KEY_ERROR)
+        elif data["msgType"] == "GetDeviceListAck":
+            self._probe_device_list(data, ip)
+        elif data["msgType"] == "WriteDeviceAck":
+            self._probe_result(data["mac"], PROBE_OK)
+
+    def _probe_device_list(self, data, ip):
+        """Read one device of a hub that answered, to check the accessToken."""
+        if self._probe.get(ip) != PROBE_NO_ANSWER:
+            return
+        self._probe[ip] = PROBE_UNVERIFIED
+        self._device_ips[data["mac"]] = ip
+        self._hub_access_token(data["mac"], data["token"])
+        if data["deviceType"] in WIFIMOTORTYPE:
+            self._probe_reads[ip] = (data["mac"], data["deviceType"])
+        else:
+            for item in data["data"]:
+                if item["deviceType"] in BLINDSDEVICETYPE:
+                    self._probe_reads[ip] = (item["mac"], item["deviceType"])
+                    break
+            else:
+                self._probe_result(data["mac"], PROBE_OK)
+                return
+        self._get_device_info(*self._probe_reads[ip])
+
+    def _probe_result(self, mac, result):
+        """Record whether a hub took the accessToken."""
+        ip = self._device_ips.get(mac) or self._device_ips.get(mac[:12])
+        if ip is None or self._probe.get(ip) != PROBE_UNVERIFIED:
+            return
+        self._probe[ip] = result
+        if all(item in (PROBE_OK, PROBE_KEY_ERROR) for item in self._probe.values()):
+            self._probe_done.set()
 
     def start_receive_data(self):
         """Join UDP multicast and create threads."""
         if self._listening:
-            _LOGGER.info("32101 is listening")
+            _LOGGER.info("%s is listening", self._receive_port)
         else:
-            self._listening = True
             self._join_group_control()
+            if not self._isconnected:
+                return
+            self._listening = True
             self._exit_thread = False
+            self._executor = ThreadPoolExecutor(
+                max_workers=ACK_WORKERS, thread_name_prefix="connector"
+            )
             self._thread01 = Thread(target=self._receive_data)
             self._thread01.start()
             self.get_device_list()
-            self.get_device_list()
+            self._executor.submit(self._read_devicelist_later)
+
+    async def async_start(self):
+        """Join UDP multicast and receive on the event loop."""
+        if self._listening:
+            _LOGGER.info("%s is listening", self._receive_port)
+            return
+        self._listening = True
+        self._loop = asyncio.get_running_loop()
+        self._discovery_done = asyncio.Event()
+        self._receive_failed = asyncio.Event()
+        if self._open_endpoint():
+            self._set_connected(True)
+            self._create_task(self._async_discover())
+        self._supervisor = self._loop.create_task(self._async_supervise())
 
     def close_receive_data(self):
         """Close receive thread."""
         self._listening = False
         self._exit_thread = True
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+            self._supervisor = None
+        if self._loop is not None:
+            self._close_endpoint()
+            self._cancel_requests()
+            self._loop = None
+        if self._discovery_done is not None:
+            self._discovery_done.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            with self._acks_lock:
+                self._acks_waiting.clear()
+                self._acks_busy.clear()
         if self._mysocket is not None:
+            try:
+                self._mysocket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
             self._mysocket.close()
             self._mysocket = None
 
+    def _cancel_requests(self):
+        """Cancel the tasks, requests and group commands still under way."""
+        for task in list(self._tasks):
+            task.cancel()
+        for scheduler in self._schedulers.values():
+            scheduler.close()
+        for msgid in list(self._pending):
+            self._drop_request(msgid)
+        batch, self._batch = self._batch, []
+        for _, _, future in batch:
+            if not future.done():
+                future.set_result(None)
+
     def get_device_list(self):
         """Get device list."""
         data = {"msgType": "GetDeviceList", "msgID": get_msgid()}
         self._send_data(data)
 
-    async def device_list(self):
-        """Return the device list."""
-        for i in range(20):
-            if self._readdevicelist_havedone:
-                return self._device_list
-            await asyncio.sleep(1)
-        return None
+    async def device_list(self, timeout=DISCOVERY_TIMEOUT):
+        """Return the device list once discovery has finished.
+
+        Return None when nothing was found, or when the connector closes.
+        """
+        if self._discovery_done is None:
+            for i in range(timeout):
+                if self._readdevicelist_havedone:
+                    return self._device_list.snapshot()
+                await asyncio.sleep(1)
+            return None
+        try:
+            await asyncio.wait_for(self._discovery_done.wait(), timeout)
+            if not self._listening:
+                return None
+        except asyncio.TimeoutError:
+            if not self._device_list:
+                return None
+            _LOGGER.warning("Discovery is incomplete: %s", self.discovery_progress)
+            self._readdevicelist_havedone = True
+            self._discovery_done.set()
+        return self._device_list.snapshot()
+
+    async def async_update_devices(self, max_age=None):
+        """Poll the two way blinds of every hub, in parallel.
+
+        With max_age only blinds without a report or ack in the last max_age
+        seconds are polled.
+        """
+        await asyncio.gather(
+            *(
+                self._async_update_device(device, max_age)
+                for device in self._device_list.values()
+            )
+        )
+
+    async def _async_update_device(self, device, max_age):
+        """Poll one hub or wifi motor."""
+        if isinstance(device, Hub):
+            await device.async_update_blinds(max_age)
+        elif max_age is None or device.is_stale(max_age):
+            try:
+                await device.async_update_state()
+            except asyncio.TimeoutError:
+                _LOGGER.warning("Update wifi motor %s time out", device.mac)
+
+    def _find_device(self, mac):
+        """Return the blind or wifi motor with this mac."""
+        return self._routes[mac]
+
+    async def async_move_many(self, commands):
+        """Send an operation to each of many blinds at once.
+
+        commands is an iterable of (mac, operation) where operation is the
+        data of a WriteDevice message, such as {"operation": 1} or
+        {"targetPosition": 30}. Hubs are driven in parallel and each one is
+        paced by its own scheduler. Return a dict of mac to the ack, or to
+        the exception raised for that blind.
+        """
+        commands = list(commands)
+        results = await self._async_move_all(commands)
+        return {mac: result for (mac, _), result in zip(commands, results)}
+
+    async def _async_move_all(self, commands):
+        """Send a group command and return the results in order."""
+        return await asyncio.gather(
+            *(self._async_move(mac, operation) for mac, operation in commands),
+            return_exceptions=True,
+        )
+
+    async def _async_move(self, mac, operation):
+        """Send an operation to one blind of a group command."""
+        return await self._find_device(mac)._async_write_device(operation)
+
+    def async_queue_move(self, mac, operation):
+        """Add an operation to the group command sent on the next loop cycle.
+
+        Commands queued during the same event loop iteration, such as those
+        of a scene or group activation, go out as one async_move_many call.
+        A two way blind starts predicting its move right away. Return a
+        future for the ack of this blind.
+        """
+        if isinstance(device := self._routes.get(mac), TwoWayBlind):
+            device._command_sent(operation)
+        future = self._loop.create_future()
+        if not self._batch:
+            self._loop.call_soon(self._send_batch)
+        self._batch.append((mac, operation, future))
+        return future
+
+    def _send_batch(self):
+        """Send the queued operations as one group command."""
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+        task = self._loop.create_task(
+            self._async_move_all([(mac, operation) for mac, operation, _ in batch])
+        )
+        task.add_done_callback(lambda done: _finish_batch(batch, done))
+
+    @property
+    def metrics(self):
+        """Return the metrics registry."""
+        return self._metrics
+
+    @property
+    def devices(self):
+        """Return the devices known so far, stored or discovered."""
+        return self._device_list.snapshot()
+
+    def states(self):
+        """Return position, angle and last report time of each two way blind."""
+        return {
+            mac: (device.position, device.angle, device.last_report)
+            for mac, device in self._routes.items()
+            if isinstance(device, TwoWayBlind)
+        }
+
+    @property
+    def discovery_progress(self):
+        """Return the answered and listed blinds of each hub."""
+        return {
+            mac: (total - len(self._discovery_waiting[mac]), total)
+            for mac, total in self._discovery_total.items()
+        }
+
+    @property
+    def hub_ips(self):
+        """Return the IPs of the hubs."""
+        return self._hub_ips
 
     @property
     def is_connected(self):
@@ -283,50 +2019,133 @@ class ConnectorHub:
         return self._errorcode
 
 
+class _DeviceContext:
+    """What a hub and its blinds share to talk to them."""
+
+    __slots__ = ("access_token", "send_data", "request", "events", "clock")
+
+    def __init__(self, access_token, send_data, request, events=None, clock=None):
+        """Init _DeviceContext class.
+
+        clock returns the monotonic time the blinds time their moves with.
+        """
+        self.access_token = access_token
+        self.send_data = send_data
+        self.request = request
+        self.events = _EventBroker() if events is None else events
+        self.clock = time.monotonic if clock is None else clock
+
+
 class Hub:
     """Hub Class."""
 
-    def __init__(self, mac, version, token, access_token, devicetype, func):
-        """Init Hub class."""
+    __slots__ = (
+        "_mac",
+        "_version",
+        "_toen",
+        "_blinds",
+        "_devicetype",
+        "_context",
+        "_routes",
+        "_lock",
+    )
+
+    def __init__(
+        self,
+        mac,
+        version,
+        token,
+        access_token,
+        devicetype,
+        func,
+        request=None,
+        routes=None,
+        events=None,
+    ):
+        """Init Hub class.
+
+        routes is the mac to device registry of the ConnectorHub, kept up to
+        date as blinds are added and removed, events its event listeners.
+        Without request, the async methods of the blinds cannot be used.
+        """
         self._mac = mac
         self._version = version
         self._toen = token
-        self._accesstoken = access_token
-        self._blinds = {}
+        self._blinds = _Registry()
         self._devicetype = devicetype
-        self._send_data = func
+        self._context = _DeviceContext(access_token, func, request, events)
+        self._routes = _Registry() if routes is None else routes
+        self._lock = Lock()
 
     def add_blinds(self, blind):
-        """Add blinds to blind list."""
+        """Add blinds to blind list, or update the info of a known blind.
+
+        return the blind before and after, either of which may be None.
+        """
+        with self._lock:
+            current = self._blinds.get(blind["mac"])
+            return current, self._add_blind(blind, current)
+
+    def _add_blind(self, blind, current):
+        """Add or update a blind, return the one kept."""
         mac = blind["mac"]
-        if mac not in self._blinds:
-            if blind["data"]["wirelessMode"] in ONEWAYWIRELESSMODE:
-                self._blinds[mac] = OneWayBlind(
-                    mac=blind["mac"],
-                    devicetype=blind["deviceType"],
-                    wirelessmode=blind["data"]["wirelessMode"],
-                    accesstoken=self._accesstoken,
-                    blind_type=blind["data"]["type"],
-                    func=self._send_data,
-                )
-            elif blind["data"]["wirelessMode"] in TWOWAYWIRELESSMODE:
-                self._blinds[mac] = TwoWayBlind(
-                    mac=blind["mac"],
-                    devicetype=blind["deviceType"],
-                    wirelessmode=blind["data"]["wirelessMode"],
-                    accesstoken=self._accesstoken,
-                    position=blind["data"]["currentPosition"],
-                    blind_type=blind["data"]["type"],
-                    angle=blind["data"]["currentAngle"],
-                    func=self._send_data,
-                )
-            else:
-                _LOGGER.warning("This wirelessMode not support")
+        wireless_mode = blind["data"]["wirelessMode"]
+        if current is not None:
+            if (current.wireless_mode in TWOWAYWIRELESSMODE) == (
+                wireless_mode in TWOWAYWIRELESSMODE
+            ):
+                current.set_info(wireless_mode, blind["data"]["type"])
+                return current
+        if wireless_mode in ONEWAYWIRELESSMODE:
+            new = OneWayBlind(
+                mac=blind["mac"],
+                devicetype=blind["deviceType"],
+                wirelessmode=wireless_mode,
+                accesstoken=None,
+                blind_type=blind["data"]["type"],
+                func=None,
+                request=None,
+                context=self._context,
+            )
+        elif wireless_mode in TWOWAYWIRELESSMODE:
+            new = TwoWayBlind(
+                mac=blind["mac"],
+                devicetype=blind["deviceType"],
+                wirelessmode=wireless_mode,
+                accesstoken=None,
+                position=blind["data"]["currentPosition"],
+                blind_type=blind["data"]["type"],
+                angle=blind["data"]["currentAngle"],
+                func=None,
+                context=self._context,
+            )
+        else:
+            _LOGGER.warning("This wirelessMode not support")
+            self._blinds.pop(mac)
+            self._routes.pop(mac)
+            return None
+        self._blinds.set(mac, new)
+        self._routes.set(mac, new)
+        return new
+
+    def remove_blind(self, mac):
+        """Remove a blind the hub no longer lists."""
+        with self._lock:
+            self._blinds.pop(mac)
+            self._routes.pop(mac)
+
+    def set_version(self, version):
+        """when the hub answers again, use this to change its version."""
+        self._version = version
+
+    def set_access_token(self, access_token):
+        """when the token changes, use this to change the accessToken."""
+        self._context.access_token = access_token
 
     @property
     def blinds_list(self):
         """return all blinds."""
-        return self._blinds
+        return self._blinds.snapshot()
 
     @property
     def hub_version(self):
@@ -348,24 +2167,71 @@ class Hub:
         for device in self._blinds.values():
             if device.wireless_mode in TWOWAYWIRELESSMODE:
                 device.update_state()
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                loop.run_until_complete(delay(0.5))
-                loop.close()
+                time.sleep(SEND_INTERVAL)
+
+    async def async_update_blinds(self, max_age=None):
+        """update the position of the blinds, paced by the hub scheduler.
+
+        With max_age only blinds whose state is older than max_age seconds
+        are polled.
+        """
+        await asyncio.gather(
+            *(
+                self._async_update_blind(device)
+                for device in self._blinds.values()
+                if device.wireless_mode in TWOWAYWIRELESSMODE
+                and (max_age is None or device.is_stale(max_age))
+            )
+        )
+
+    async def _async_update_blind(self, device):
+        """update the position of one blind."""
+        try:
+            await device.async_update_state()
+        except asyncio.TimeoutError:
+            _LOGGER.warning("Update blind %s time out", device.mac)
 
 
 class OneWayBlind:
     """One way blind class."""
 
-    def __init__(self, mac, devicetype, wirelessmode, accesstoken, blind_type, func):
-        """Init OneWayBlind class."""
+    __slots__ = (
+        "_mac",
+        "_devicetype",
+        "_wireless_mode",
+        "_context",
+        "_callback",
+        "_type",
+        "_last_error",
+    )
+
+    def __init__(
+        self,
+        mac,
+        devicetype,
+        wirelessmode,
+        accesstoken,
+        blind_type,
+        func,
+        request=None,
+        context=None,
+        events=None,
+    ):
+        """Init OneWayBlind class.
+
+        A blind of a hub shares the context of the hub, otherwise it gets
+        its own from accesstoken, func, request and events. Without request,
+        the async methods cannot be used.
+        """
         self._mac = mac
         self._devicetype = devicetype
         self._wireless_mode = wirelessmode
-        self._accesstoken = accesstoken
+        if context is None:
+            context = _DeviceContext(accesstoken, func, request, events)
+        self._context = context
         self._callback = None
         self._type = blind_type
-        self._send_data = func
+        self._last_error = None
 
     def open(self):
         """open blind."""
@@ -382,17 +2248,38 @@ class OneWayBlind:
         operation = {"operation": 2}
         self._write_device(operation)
 
-    def _write_device(self, operation):
-        """Send message to blind."""
-        data = {
+    async def async_open(self):
+        """open blind and return the ack."""
+        return await self._async_write_device({"operation": 1})
+
+    async def async_close(self):
+        """close blind and return the ack."""
+        return await self._async_write_device({"operation": 0})
+
+    async def async_stop(self):
+        """stop blind and return the ack."""
+        return await self._async_write_device({"operation": 2})
+
+    def _write_request(self, operation):
+        """Build the message for the blind."""
+        return {
             "msgType": "WriteDevice",
             "msgID": get_msgid(),
             "deviceType": self._devicetype,
             "mac": self._mac,
-            "AccessToken": self._accesstoken,
+            "AccessToken": self._context.access_token,
             "data": operation,
         }
-        self._send_data(data)
+
+    def _write_device(self, operation):
+        """Send message to blind."""
+        self._context.send_data(self._write_request(operation))
+
+    async def _async_write_device(self, operation):
+        """Send message to blind and return the ack."""
+        return await self._context.request(
+            self._write_request(operation), "WriteDeviceAck"
+        )
 
     @property
     def mac(self):
@@ -404,6 +2291,11 @@ class OneWayBlind:
         """return devicetype."""
         return self._devicetype
 
+    @property
+    def devicetype(self):
+        """return devicetype."""
+        return self._devicetype
+
     @property
     def type(self):
         """return blind type."""
@@ -414,25 +2306,67 @@ class OneWayBlind:
         """return blind wirelessMode."""
         return self._wireless_mode
 
+    def set_info(self, wirelessmode, blind_type):
+        """when the hub lists the blind again, use this to change its info."""
+        self._wireless_mode = wirelessmode
+        self._type = blind_type
+
+    def set_access_token(self, accesstoken):
+        """when the token changes, use this to change the accessToken."""
+        self._context.access_token = accesstoken
+
+    @property
+    def last_error(self):
+        """return why the last request failed, or None if it was acked."""
+        return self._last_error
+
+    def set_error(self, error):
+        """when a request fails or is acked again, use this to change it."""
+        self._last_error = error
+
     def register_callback(self, func):
-        """register the callback."""
-        self._callback = func
+        """register the callback, called without arguments on each update.
+
+        It replaces the callback registered before, other listeners
+        subscribe through ConnectorHub.subscribe.
+        """
+        self.remove_callback()
+        self._callback = self._context.events.subscribe(lambda event: func(), self._mac)
 
     def remove_callback(self):
         """remove the callback."""
-        self._callback = None
+        if self._callback is not None:
+            self._callback()
+            self._callback = None
 
     def run_callback(self):
-        """run the call back function."""
-        if self._callback is None:
-            _LOGGER.warning("This one way blind not register callback function")
-            return
-        self._callback()
+        """tell the listeners of this blind."""
+        self._context.events.publish(self)
 
 
 class TwoWayBlind:
     """Two way blind class."""
 
+    __slots__ = (
+        "_mac",
+        "_devicetype",
+        "_wireless_mode",
+        "_context",
+        "_position",
+        "_callback",
+        "_type",
+        "_angle",
+        "_last_report",
+        "_last_error",
+        "_target",
+        "_direction",
+        "_speed",
+        "_moved_from",
+        "_moved_at",
+        "_step",
+        "_stopping",
+    )
+
     def __init__(
         self,
         func,
@@ -443,19 +2377,34 @@ class TwoWayBlind:
         position=0,
         wirelessmode=1,
         angle=0,
+        request=None,
+        context=None,
+        events=None,
     ):
-        """Init TwoWayBlind class."""
+        """Init TwoWayBlind class.
+
+        A blind of a hub shares the context of the hub, a wifi motor gets
+        its own from accesstoken, func, request and events.
+        """
         self._mac = mac
-        self._send_data = func
+        if context is None:
+            context = _DeviceContext(accesstoken, func, request, events)
+        self._context = context
         self._devicetype = devicetype
         self._wireless_mode = wirelessmode
-        self._accesstoken = accesstoken
-        self.isopening = False
-        self.isclosing = False
         self._position = position
         self._callback = None
         self._type = blind_type
         self._angle = angle
+        self._last_report = None
+        self._last_error = None
+        self._target = None
+        self._direction = 0
+        self._speed = None
+        self._moved_from = position
+        self._moved_at = None
+        self._step = 0
+        self._stopping = False
 
     def open(self):
         """Open blind."""
@@ -492,17 +2441,56 @@ class TwoWayBlind:
         operation = {"operation": 5}
         self._write_device(operation)
 
-    def _write_device(self, operation):
-        """Send message to blind."""
-        data = {
+    async def async_open(self):
+        """Open blind and return the ack."""
+        return await self._async_write_device({"operation": 1})
+
+    async def async_close(self):
+        """Close blind and return the ack."""
+        return await self._async_write_device({"operation": 0})
+
+    async def async_stop(self):
+        """Stop blind and return the ack."""
+        return await self._async_write_device({"operation": 2})
+
+    async def async_target_position(self, percent):
+        """Percentage control and return the ack."""
+        if int(percent) > 100 or int(percent) < 0:
+            _LOGGER.warning("Percent must in 0~100")
+        return await self._async_write_device({"targetPosition": percent})
+
+    async def async_target_angle(self, angle):
+        """Angle control and return the ack."""
+        if int(angle) > 180 or int(angle) < 0:
+            _LOGGER.warning("Angle must in 0~180")
+            return None
+        return await self._async_write_device({"targetAngle": int(angle)})
+
+    async def async_update_state(self):
+        """update the position of the blind and return the ack."""
+        return await self._async_write_device({"operation": 5})
+
+    def _write_request(self, operation):
+        """Build the message for the blind."""
+        self._command_sent(operation)
+        return {
             "msgType": "WriteDevice",
             "msgID": get_msgid(),
             "deviceType": self._devicetype,
             "mac": self._mac,
-            "AccessToken": self._accesstoken,
+            "AccessToken": self._context.access_token,
             "data": operation,
         }
-        self._send_data(data)
+
+    def _write_device(self, operation):
+        """Send message to blind."""
+        self._context.send_data(self._write_request(operation))
+
+    async def _async_write_device(self, operation):
+        """Send message to blind and return the ack."""
+        return await self._context.request(
+            self._write_request(operation), "WriteDeviceAck"
+        )
 
     @property
     def mac(self):
@@ -539,6 +2527,24 @@ class TwoWayBlind:
         """return blind wirelessMode."""
         return self._wireless_mode
 
+    def set_info(self, wirelessmode, blind_type):
+        """when the hub lists the blind again, use this to change its info."""
+        self._wireless_mode = wirelessmode
+        self._type = blind_type
+
+    def set_access_token(self, accesstoken):
+        """when the token changes, use this to change the accessToken."""
+        self._context.access_token = accesstoken
+
+    @property
+    def last_error(self):
+        """return why the last request failed, or None if it was acked."""
+        return self._last_error
+
+    def set_error(self, error):
+        """when a request fails or is acked again, use this to change it."""
+        self._last_error = error
+
     def set_position(self, position):
         """when receive the report, use this to change position."""
         self._position = position
@@ -547,16 +2553,144 @@ class TwoWayBlind:
         """when receive the report, use this to change angle."""
         self._angle = angle
 
+    def set_state(self, position, angle):
+        """when receive the report or ack, use this to change the state.
+
+        return the names of the properties which changed.
+        """
+        now = self._context.clock()
+        changed = _UNCHANGED
+        if position != self._position:
+            self._position_changed(position, now)
+            changed = _POSITION_CHANGED
+        self._stopping = False
+        if angle != self._angle:
+            changed |= _ANGLE_CHANGED
+        self._position = position
+        self._angle = angle
+        self._last_report = now
+        return changed
+
+    def _command_sent(self, operation):
+        """Start predicting a move towards the target of a command."""
+        if "targetPosition" in operation:
+            target = int(operation["targetPosition"])
+        elif operation.get("operation") in (0, 1):
+            target = 100 if operation["operation"] == 0 else 0
+        elif operation.get("operation") == 2:
+            self._direction = 0
+            self._target = None
+            self._step = 0
+            self._stopping = True
+            return
+        else:
+            return
+        self._stopping = False
+        self._moved_from = self.predicted_position
+        self._moved_at = self._context.clock()
+        self._target = target
+        self._direction = (target > self._moved_from) - (target < self._moved_from)
+
+    def _position_changed(self, position, now):
+        """Learn the speed and direction of a move from a new position.
+
+        The first report after a stop is where the blind halted. Without a
+        command in flight, a move is only taken as one after two changes
+        in the same direction, as a single change may be its last report.
+        """
+        direction = (position > self._position) - (position < self._position)
+        step, self._step = self._step, direction
+        if self._stopping:
+            self._step = 0
+            return
+        commanded = self._target is not None and direction == self._direction
+        if not commanded and (
+            self._moved_at is None or now - self._moved_at >= MOTION_TIMEOUT
+        ):
+            step = 0
+        if ((commanded and self.is_moving) or step == direction) and (
+            now > self._moved_at
+        ):
+            speed = abs(position - self._moved_from) / (now - self._moved_at)
+            self._speed = speed if self._speed is None else (self._speed + speed) / 2
+        self._moved_from = position
+        self._moved_at = now
+        if position == self._target or position in (0, 100):
+            self._direction = 0
+            self._target = None
+            self._step = 0
+            return
+        if not commanded:
+            self._target = None
+        self._direction = direction if commanded or step == direction else 0
+
+    @property
+    def is_moving(self):
+        """return if the blind is moving, as far as the reports tell.
+
+        A move is over MOTION_TIMEOUT after the last change of position, or
+        after the time a commanded move should take at the learned speed.
+        """
+        if self._direction == 0:
+            return False
+        timeout = MOTION_TIMEOUT
+        if self._target is not None and self._speed:
+            timeout += abs(self._target - self._moved_from) / self._speed
+        return self._context.clock() - self._moved_at < timeout
+
+    @property
+    def isopening(self):
+        """return if the blind is opening."""
+        return self._direction < 0 and self.is_moving
+
+    @property
+    def isclosing(self):
+        """return if the blind is closing."""
+        return self._direction > 0 and self.is_moving
+
+    @property
+    def predicted_position(self):
+        """return the position expected now, moving on from the last one.
+
+        Between reports the blind is taken to keep the speed it moved at
+        before, stopping at its target.
+        """
+        if not self.is_moving or self._speed is None:
+            return self._position
+        moved = self._speed * (self._context.clock() - self._moved_at)
+        if self._direction > 0:
+            end = 100 if self._target is None else self._target
+            return min(end, self._moved_from + moved)
+        end = 0 if self._target is None else self._target
+        return max(end, self._moved_from - moved)
+
+    @property
+    def last_report(self):
+        """return the monotonic time of the last report or ack, or None."""
+        return self._last_report
+
+    def is_stale(self, max_age):
+        """return if the state is older than max_age seconds."""
+        return (
+            self._last_report is None
+            or self._context.clock() - self._last_report > max_age
+        )
+
     def register_callback(self, func):
-        """register the callback."""
-        self._callback = func
+        """register the callback, called without arguments on each update.
+
+        It replaces the callback registered before, other listeners
+        subscribe through ConnectorHub.subscribe.
+        """
+        self.remove_callback()
+        self._callback = self._context.events.subscribe(lambda event: func(), self._mac)
 
     def remove_callback(self):
         """remove the callback."""
-        self._callback = None
+        if self._callback is not None:
+            self._callback()
+            self._callback = None
 
     def run_callback(self):
-        """run the call back function."""
-        if self._callback is None:
-            return
-        self._callback()
\ No newline at end of file
+        """tell the listeners of this blind."""
+        self._context.events.publish(self)
\ No newline at end of file
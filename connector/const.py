@@ -10,19 +10,36 @@ PLATFORMS = [Platform.COVER]
 
 CONF_WAIT_FOR_PUSH = "wait_for_push"
 CONF_INTERFACE = "interface"
+CONF_STALE_AFTER = "stale_after"
+CONF_UNICAST = "unicast"
+CONF_WRITE_INTERVAL = "write_interval"
 DEFAULT_WAIT_FOR_PUSH = False
 DEFAULT_INTERFACE = "any"
+DEFAULT_STALE_AFTER = 3600
+DEFAULT_UNICAST = False
+DEFAULT_WRITE_INTERVAL = 1.0
+UPDATE_INTERVAL = 300
 
 KEY_GATEWAY = "gateway"
 KEY_API_LOCK = "api_lock"
 KEY_COORDINATOR = "coordinator"
 KEY_MULTICAST_LISTENER = "multicast_listener"
 KEY_SETUP_LOCK = "setup_lock"
+KEY_STORE = "store"
 KEY_UNSUB_STOP = "unsub_stop"
 KEY_VERSION = "version"
 
 ATTR_WIDTH = "width"
 ATTR_ABSOLUTE_POSITION = "absolute_position"
 ATTR_AVAILABLE = "available"
+ATTR_MAX_AGE = "max_age"
+ATTR_LAST_ERROR = "last_error"
 
 SERVICE_SET_ABSOLUTE_POSITION = "set_absolute_position"
+SERVICE_REFRESH_STALE = "refresh_stale"
+
+SIGNAL_CONNECTION_CHANGED = "connector_connection_changed_{}"
+SIGNAL_DEVICES_CHANGED = "connector_devices_changed_{}"
+
+STORAGE_VERSION = 1
+TOPOLOGY_SAVE_DELAY = 30
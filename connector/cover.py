@@ -1,5 +1,7 @@
 """Support for Motion Blinds using their WLAN API."""
 
+import asyncio
+from datetime import timedelta
 import logging
 
 from .connectorlocal import (
@@ -7,18 +9,34 @@ from .connectorlocal import (
     TWOWAYWIRELESSMODE,
     VENETIANTYPE,
     WIFIMOTORTYPE,
+    Hub,
 )
 
 from homeassistant.components.cover import (
     ATTR_POSITION,
     ATTR_TILT_POSITION,
+    DOMAIN as COVER_DOMAIN,
     CoverDeviceClass,
     CoverEntity,
 )
 from homeassistant.core import callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.event import async_track_time_interval
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from .const import DOMAIN, KEY_COORDINATOR, KEY_GATEWAY, MANUFACTURER
+from .const import (
+    ATTR_LAST_ERROR,
+    CONF_WRITE_INTERVAL,
+    DEFAULT_WRITE_INTERVAL,
+    DOMAIN,
+    KEY_COORDINATOR,
+    KEY_GATEWAY,
+    MANUFACTURER,
+    SIGNAL_CONNECTION_CHANGED,
+    SIGNAL_DEVICES_CHANGED,
+)
 
 HUB_TYPE_DEVICE_CLASS_MAP = {
     1: CoverDeviceClass.SHADE,
@@ -43,74 +61,80 @@ _LOGGER = logging.getLogger(__name__)
 
 async def async_setup_entry(hass, config_entry, async_add_entities):
     """Set up the Motion Blind from a config entry."""
-    entities = []
     connector = hass.data[DOMAIN][config_entry.entry_id][KEY_GATEWAY]
     coordinator = hass.data[DOMAIN][config_entry.entry_id][KEY_COORDINATOR]
-    device_list = await connector.device_list()
-    if device_list is None:
-        return
-    for hub in device_list.values():
-        if hub.devicetype in WIFIMOTORTYPE:
-            wifi_motor_type = HUB_TYPE_DEVICE_CLASS_MAP.get(
-                hub.type, CoverDeviceClass.SHADE
-            )
-            entities.append(
-                TwoWayDevice(
-                    coordinator=coordinator,
-                    blind=hub,
-                    device_class=wifi_motor_type,
-                    config_entry=config_entry,
-                )
-            )
+    entity_registry = er.async_get(hass)
+
+    def _create_entities(devices):
+        """Create the entities of devices and of the blinds of hubs."""
+        entities = []
+        for device in devices:
+            if isinstance(device, Hub):
+                entities.extend(_create_entities(device.blinds_list.values()))
+            elif (
+                entity := _create_entity(coordinator, connector, device, config_entry)
+            ) is not None:
+                entities.append(entity)
+        return entities
+
+    @callback
+    def _async_devices_changed(added, removed):
+        """Add entities for new devices and remove those of removed devices."""
+        for mac in removed:
+            if entity_id := entity_registry.async_get_entity_id(
+                COVER_DOMAIN, DOMAIN, mac
+            ):
+                entity_registry.async_remove(entity_id)
+        if entities := _create_entities(added):
+            async_add_entities(entities)
+
+    config_entry.async_on_unload(
+        async_dispatcher_connect(
+            hass,
+            SIGNAL_DEVICES_CHANGED.format(config_entry.entry_id),
+            _async_devices_changed,
+        )
+    )
+    async_add_entities(_create_entities(list(connector.devices.values())))
+
+
+def _create_entity(coordinator, connector, blind, config_entry):
+    """Create the entity matching a blind or wifi motor."""
+    blind_type = HUB_TYPE_DEVICE_CLASS_MAP.get(blind.type, CoverDeviceClass.SHADE)
+    if blind.devicetype in WIFIMOTORTYPE:
+        entity_class = TwoWayDevice
+    elif blind.wireless_mode in ONEWAYWIRELESSMODE:
+        entity_class = OneWayDevice
+    elif blind.wireless_mode in TWOWAYWIRELESSMODE:
+        if blind.type in VENETIANTYPE:
+            entity_class = TiltDevice
         else:
-            for blind in hub.blinds_list.values():
-                blind_type = HUB_TYPE_DEVICE_CLASS_MAP.get(
-                    blind.type, CoverDeviceClass.SHADE
-                )
-                if blind.wireless_mode in ONEWAYWIRELESSMODE:
-                    entities.append(
-                        OneWayDevice(
-                            coordinator=coordinator,
-                            blind=blind,
-                            device_class=blind_type,
-                            config_entry=config_entry,
-                        )
-                    )
-                elif blind.wireless_mode in TWOWAYWIRELESSMODE:
-                    if blind.type in VENETIANTYPE:
-                        entities.append(
-                            TiltDevice(
-                                coordinator=coordinator,
-                                blind=blind,
-                                device_class=blind_type,
-                                config_entry=config_entry,
-                            )
-                        )
-                    else:
-                        entities.append(
-                            TwoWayDevice(
-                                coordinator=coordinator,
-                                blind=blind,
-                                device_class=blind_type,
-                                config_entry=config_entry,
-                            )
-                        )
-                else:
-                    _LOGGER.info("This wirelessMode not support")
-
-    async_add_entities(entities)
+            entity_class = TwoWayDevice
+    else:
+        _LOGGER.info("This wirelessMode not support")
+        return None
+    return entity_class(
+        coordinator=coordinator,
+        connector=connector,
+        blind=blind,
+        device_class=blind_type,
+        config_entry=config_entry,
+    )
 
 
 class OneWayDevice(CoordinatorEntity, CoverEntity):
     """Representation of a Motion Blind Device."""
 
-    def __init__(self, coordinator, blind, device_class, config_entry):
+    def __init__(self, coordinator, connector, blind, device_class, config_entry):
         """Initialize the blind."""
         super().__init__(coordinator)
+        self._connector = connector
         self._blind = blind
         self._attr_device_class = device_class
         self._config_entry = config_entry
         self._attr_name = f"{self._blind.mac[-4:]}"
+        self._debouncer = None
+        self._unsub_motion = None
         self._attr_unique_id = self._blind.mac
         self._attr_device_info = {
             "identifiers": {(DOMAIN, self._blind.mac)},
@@ -130,19 +154,79 @@ class OneWayDevice(CoordinatorEntity, CoverEntity):
         """Return if the cover is closed or not."""
         return None
 
+    @property
+    def available(self):
+        """Return if the multicast pushes are being received."""
+        return super().available and self._connector.is_connected
+
+    @property
+    def extra_state_attributes(self):
+        """Return why the last command failed, if it did."""
+        return {ATTR_LAST_ERROR: self._blind.last_error}
+
     @callback
     def _push_callback(self):
-        """Update entity state when a push has been received."""
-        self.schedule_update_ha_state(force_refresh=False)
+        """Update entity state when a push has been received.
+
+        The reports of a moving cover are written at most once per write
+        interval, the one at rest right away.
+        """
+        self._track_motion()
+        self._async_write_state()
+
+    @callback
+    def _async_write_state(self):
+        """Write the state, at most once per write interval while moving."""
+        if self._debouncer is None or self._is_at_rest():
+            if self._debouncer is not None:
+                self._debouncer.async_cancel()
+            self.async_write_ha_state()
+            return
+        self.hass.async_create_task(self._debouncer.async_call())
+
+    def _is_at_rest(self):
+        """Return if the last push shows the cover at rest."""
+        return True
+
+    def _track_motion(self):
+        """Follow the predicted position of a moving cover."""
+
+    @callback
+    def _connection_callback(self, connected):
+        """Update availability when receiving stops or starts again."""
+        self.async_write_ha_state()
 
     async def async_added_to_hass(self):
         """Subscribe to multicast pushes."""
+        interval = self._config_entry.options.get(
+            CONF_WRITE_INTERVAL, DEFAULT_WRITE_INTERVAL
+        )
+        if interval:
+            self._debouncer = Debouncer(
+                self.hass,
+                _LOGGER,
+                cooldown=interval,
+                immediate=True,
+                function=self.async_write_ha_state,
+            )
         self._blind.register_callback(self._push_callback)
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass,
+                SIGNAL_CONNECTION_CHANGED.format(self._config_entry.entry_id),
+                self._connection_callback,
+            )
+        )
         await super().async_added_to_hass()
 
     async def async_will_remove_from_hass(self):
         """Unsubscribe when removed."""
         self._blind.remove_callback()
+        if self._debouncer is not None:
+            self._debouncer.async_cancel()
+        if self._unsub_motion is not None:
+            self._unsub_motion()
+            self._unsub_motion = None
         return super().async_will_remove_from_hass()
 
     @property
@@ -150,22 +234,76 @@ class OneWayDevice(CoordinatorEntity, CoverEntity):
         """Return the current position."""
         return None
 
-    def open_cover(self, **kwargs):
+    async def _async_move(self, operation):
+        """Send an operation together with the other covers moved at once.
+
+        The ack is not awaited, so an unreachable cover does not hold up a
+        scene; a failure is logged and shows in its last_error attribute.
+        """
+        future = self._connector.async_queue_move(self._blind.mac, operation)
+        future.add_done_callback(self._move_done)
+        self._track_motion()
+
+    def _move_done(self, future):
+        """Log a command which failed or got no ack."""
+        if future.cancelled() or (exc := future.exception()) is None:
+            return
+        if isinstance(exc, asyncio.TimeoutError):
+            _LOGGER.warning("No ack from %s", self._blind.mac)
+        else:
+            _LOGGER.error("Moving %s failed: %s", self._blind.mac, exc)
+
+    async def async_open_cover(self, **kwargs):
         """Open the cover."""
-        self._blind.open()
+        await self._async_move({"operation": 1})
 
-    def close_cover(self, **kwargs):
+    async def async_close_cover(self, **kwargs):
         """Close cover."""
-        self._blind.close()
+        await self._async_move({"operation": 0})
 
-    def stop_cover(self, **kwargs):
+    async def async_stop_cover(self, **kwargs):
         """Stop the cover."""
-        self._blind.stop()
+        await self._async_move({"operation": 2})
 
 
 class TwoWayDevice(OneWayDevice):
     """Representation of a Motion Blind Device."""
 
+    def _is_at_rest(self):
+        """Return if the cover stopped moving."""
+        return not self._blind.is_moving
+
+    def _track_motion(self):
+        """Write the predicted position of a moving cover every interval."""
+        if self._unsub_motion is not None or not self._blind.is_moving:
+            return
+        interval = self._config_entry.options.get(
+            CONF_WRITE_INTERVAL, DEFAULT_WRITE_INTERVAL
+        )
+        self._unsub_motion = async_track_time_interval(
+            self.hass,
+            self._async_motion_tick,
+            timedelta(seconds=interval or DEFAULT_WRITE_INTERVAL),
+        )
+
+    @callback
+    def _async_motion_tick(self, now):
+        """Write the predicted position, until the cover stops."""
+        if not self._blind.is_moving:
+            self._unsub_motion()
+            self._unsub_motion = None
+        self._async_write_state()
+
+    @property
+    def is_opening(self):
+        """Return if the cover is opening."""
+        return self._blind.isopening
+
+    @property
+    def is_closing(self):
+        """Return if the cover is closing."""
+        return self._blind.isclosing
+
     @property
     def is_closed(self):
         """Return if the cover is closed or not."""
@@ -174,12 +312,12 @@ class TwoWayDevice(OneWayDevice):
     @property
     def current_cover_position(self):
         """Return the current position."""
-        return 100 - self._blind.position
+        return 100 - round(self._blind.predicted_position)
 
-    def set_cover_position(self, **kwargs):
+    async def async_set_cover_position(self, **kwargs):
         """Move the cover to a specific position."""
         position = kwargs[ATTR_POSITION]
-        self._blind.target_position(100 - position)
+        await self._async_move({"targetPosition": 100 - position})
 
 
 class TiltDevice(TwoWayDevice):
@@ -192,19 +330,19 @@ class TiltDevice(TwoWayDevice):
             return None
         return self._blind.angle * 100 / 180
 
-    def open_cover_tilt(self, **kwargs):
+    async def async_open_cover_tilt(self, **kwargs):
         """Open the cover tilt."""
-        self._blind.target_angle(180)
+        await self._async_move({"targetAngle": 180})
 
-    def close_cover_tilt(self, **kwargs):
+    async def async_close_cover_tilt(self, **kwargs):
         """Close the cover tilt."""
-        self._blind.target_angle(0)
+        await self._async_move({"targetAngle": 0})
 
-    def set_cover_tilt_position(self, **kwargs):
+    async def async_set_cover_tilt_position(self, **kwargs):
         """Move the cover tilt to a specific position."""
         angle = kwargs[ATTR_TILT_POSITION] * 180 / 100
-        self._blind.target_angle(angle)
+        await self._async_move({"targetAngle": int(angle)})
 
-    def stop_cover_tilt(self, **kwargs):
+    async def async_stop_cover_tilt(self, **kwargs):
         """Stop the cover."""
-        self._blind.stop()
+        await self._async_move({"operation": 2})
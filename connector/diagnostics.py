@@ -0,0 +1,25 @@
+"""Diagnostics support for Connector."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_API_KEY, CONF_UNIQUE_ID
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN, KEY_GATEWAY
+
+TO_REDACT = {CONF_API_KEY, CONF_UNIQUE_ID}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    connector = hass.data[DOMAIN][entry.entry_id][KEY_GATEWAY]
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "discovery": connector.discovery_progress,
+        "metrics": connector.metrics.snapshot(),
+    }
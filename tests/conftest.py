@@ -0,0 +1,61 @@
+"""Shared fixtures: ConnectorHub talking to the hub simulator, a hand moved clock."""
+
+import asyncio
+import contextlib
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "connector"), os.path.join(ROOT, "tools")]
+
+import connectorlocal  # noqa: E402
+from hub_simulator import FRONTADDRESS, REPLYPORT, HubSimulator  # noqa: E402
+
+
+@contextlib.asynccontextmanager
+async def _connected(**options):
+    """yield a started simulator and a ConnectorHub which discovered it."""
+    simulator = HubSimulator(**options)
+    await simulator.start()
+    connector = connectorlocal.ConnectorHub(
+        ip=simulator.ips,
+        key=simulator.key,
+        send_address=FRONTADDRESS,
+        send_port=simulator.port,
+        receive_port=REPLYPORT,
+    )
+    try:
+        await connector.async_start()
+        await connector.device_list()
+        yield simulator, connector
+    finally:
+        connector.close_receive_data()
+        simulator.close()
+        # let the sockets go before the next test binds the same ports
+        await asyncio.sleep(0.1)
+
+
+@pytest.fixture
+def connected():
+    """return an async context manager for a simulator and its connector."""
+    return _connected
+
+
+class _Clock:
+    """A monotonic clock moved on by hand."""
+
+    def __init__(self):
+        """Init _Clock class."""
+        self.now = 1000.0
+
+    def __call__(self):
+        """return the time."""
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    """return a hand moved clock."""
+    return _Clock()
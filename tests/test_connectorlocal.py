@@ -0,0 +1,249 @@
+"""Tests of ConnectorHub against the hub simulator."""
+
+import asyncio
+import json
+import logging
+import time
+
+import connectorlocal
+
+# a newer target has to go out before the lost one would have been resent
+RESEND_AFTER = connectorlocal.REQUEST_TIMEOUT
+
+
+def _blinds(simulator, connector):
+    """return the first blind as the connector and the simulator know it."""
+    hub = simulator.hubs[0]
+    simulated = next(iter(hub.blinds.values()))
+    return connector.devices[hub.mac].blinds_list[simulated.mac], simulated
+
+
+def _push(simulator, message):
+    """send a message from the first hub to the connector."""
+    simulator.hubs[0].transport.sendto(json.dumps(message).encode(), simulator._client)
+
+
+def _ack(simulated, **fields):
+    """return a WriteDeviceAck of a simulated blind."""
+    return {
+        "msgType": "WriteDeviceAck",
+        "mac": simulated.mac,
+        "deviceType": "10000000",
+        "data": simulated.state(),
+        **fields,
+    }
+
+
+def test_ack_with_other_msgid_answers_nothing(connected):
+    """An ack to another client's command does not complete our request."""
+
+    async def run():
+        async with connected(hubs=1, blinds=1) as (simulator, connector):
+            blind, simulated = _blinds(simulator, connector)
+            simulator.loss = simulator.multicast_loss = 1.0
+            task = asyncio.ensure_future(blind.async_open())
+            await asyncio.sleep(0.2)
+            _push(simulator, _ack(simulated, msgID="1"))
+            await asyncio.sleep(0.2)
+            assert not task.done()
+            _push(simulator, _ack(simulated))
+            ack = await asyncio.wait_for(task, 1)
+            assert "msgID" not in ack
+
+    asyncio.run(run())
+
+
+def test_ack_without_msgid_skips_unsent_request(connected, caplog):
+    """A request still queued is not matched by an ack without msgID."""
+
+    async def run():
+        async with connected(hubs=1, blinds=1) as (simulator, connector):
+            blind, simulated = _blinds(simulator, connector)
+            future = asyncio.get_running_loop().create_future()
+            connector._pending["queued"] = connectorlocal._PendingRequest(
+                {"mac": blind.mac}, "WriteDeviceAck", future
+            )
+            _push(simulator, _ack(simulated))
+            await asyncio.sleep(0.2)
+            assert not future.done()
+            assert "queued" in connector._pending
+
+    with caplog.at_level(logging.ERROR):
+        asyncio.run(run())
+    assert not caplog.records
+
+
+def test_repeated_ack_is_dropped(connected):
+    """The second copy of an ack is counted and dropped."""
+
+    async def run():
+        async with connected(hubs=1, blinds=1) as (simulator, connector):
+            blind, _ = _blinds(simulator, connector)
+            ack = await blind.async_open()
+            _push(simulator, ack)
+            await asyncio.sleep(0.2)
+            counters = connector.metrics.snapshot()["counters"]
+            assert counters["dropped"]["reason"]["duplicate"] == 1
+
+    asyncio.run(run())
+
+
+def test_refused_token_is_read_again(connected):
+    """After the hub issues a new token, the command still gets through."""
+
+    async def run():
+        async with connected(hubs=1, blinds=1) as (simulator, connector):
+            blind, simulated = _blinds(simulator, connector)
+            simulator.hubs[0].rotate_token()
+            ack = await blind.async_open()
+            assert ack is not None
+            assert simulator.token_errors >= 1
+            assert simulated.operation == 1
+            assert blind.last_error is None
+
+    asyncio.run(run())
+
+
+def test_newer_target_replaces_lost_one(connected):
+    """A target sent after a lost one goes out without resending the lost one."""
+
+    async def run():
+        async with connected(hubs=1, blinds=1) as (simulator, connector):
+            blind, simulated = _blinds(simulator, connector)
+            targets = []
+            simulator.loss = simulator.multicast_loss = 1.0
+            first = asyncio.ensure_future(blind.async_target_position(10))
+            await asyncio.sleep(0.3)
+            simulator.loss = simulator.multicast_loss = 0
+            start = time.monotonic()
+            second = asyncio.ensure_future(blind.async_target_position(80))
+            while simulated.target != 80 and time.monotonic() - start < 3:
+                targets.append(simulated.target)
+                await asyncio.sleep(0.01)
+            assert time.monotonic() - start < RESEND_AFTER
+            assert 10 not in targets
+            assert await first is None
+            assert await second is not None
+
+    asyncio.run(run())
+
+
+def test_close_stops_requests(connected, caplog):
+    """Requests under way end at once when the connector closes."""
+
+    async def run():
+        async with connected(hubs=1, blinds=3) as (simulator, connector):
+            hub = connector.devices[simulator.hubs[0].mac]
+            blinds = list(hub.blinds_list.values())
+            simulator.loss = simulator.multicast_loss = 1.0
+            tasks = [
+                asyncio.ensure_future(blinds[0].async_target_position(30)),
+                asyncio.ensure_future(blinds[1].async_open()),
+                connector.async_queue_move(blinds[2].mac, {"operation": 0}),
+            ]
+            await asyncio.sleep(1.5)
+            connector.close_receive_data()
+            results = await asyncio.wait_for(asyncio.gather(*tasks), 0.5)
+            assert results == [None, None, None]
+            await asyncio.sleep(1.5)
+            assert [blind.last_error for blind in blinds] == [None] * 3
+
+    with caplog.at_level(logging.WARNING):
+        asyncio.run(run())
+    assert not [record for record in caplog.records if "Socket" in record.message]
+
+
+def test_urgent_requests_keep_their_order():
+    """Urgent requests go first, in the order they were queued."""
+
+    async def run():
+        sent = []
+        scheduler = connectorlocal._SendScheduler(lambda data: sent.append(data))
+        results = await asyncio.gather(
+            *(scheduler.send({"msgID": index}, urgent=index >= 3) for index in range(6))
+        )
+        assert all(results)
+        assert [data["msgID"] for data in sent] == [3, 4, 5, 0, 1, 2]
+
+    asyncio.run(run())
+
+
+def test_several_listeners(connected):
+    """A registered callback and subscribers all hear of a Report."""
+
+    async def run():
+        async with connected(hubs=1, blinds=1) as (simulator, connector):
+            blind, _ = _blinds(simulator, connector)
+            heard = []
+            blind.register_callback(lambda: heard.append("callback"))
+            connector.subscribe(lambda event: heard.append(event.msg_type), blind.mac)
+            connector.subscribe(
+                lambda event: heard.append("position"), fields=["position"]
+            )
+            await blind.async_target_position(50)
+            await asyncio.sleep(0.2)
+            assert "callback" in heard
+            assert "Report" in heard
+            assert "position" in heard
+
+    asyncio.run(run())
+
+
+def _record_writes(simulator):
+    """return the list the data of each WriteDevice reaching a hub goes to."""
+    writes = []
+    write_device = simulator._write_device
+
+    def _write_device(hub, blind, message, addr):
+        writes.append(message["data"])
+        write_device(hub, blind, message, addr)
+
+    simulator._write_device = _write_device
+    return writes
+
+
+def test_stop_drops_target_of_the_same_tick(connected):
+    """A target queued right before a stop is never sent."""
+
+    async def run():
+        async with connected(hubs=1, blinds=1) as (simulator, connector):
+            blind, simulated = _blinds(simulator, connector)
+            writes = _record_writes(simulator)
+            results = await asyncio.gather(
+                connector.async_queue_move(blind.mac, {"targetPosition": 70}),
+                connector.async_queue_move(blind.mac, {"operation": 2}),
+            )
+            assert results[0] is None
+            target, _ = await asyncio.gather(
+                blind.async_target_position(20), blind.async_stop()
+            )
+            assert target is None
+            await asyncio.sleep(0.2)
+            assert writes == [{"operation": 2}, {"operation": 2}]
+            assert simulated.position == 0
+
+    asyncio.run(run())
+
+
+def test_devices_without_request_send_commands():
+    """Hubs and blinds made without request still send their commands."""
+    sent = []
+    hub = connectorlocal.Hub(
+        mac="a0b1c2000000",
+        version="A1",
+        token="token",
+        access_token="access",
+        devicetype="02000002",
+        func=sent.append,
+    )
+    blind = connectorlocal.OneWayBlind(
+        mac="a0b1c20000000001",
+        devicetype="10000000",
+        wirelessmode=0,
+        accesstoken="access",
+        blind_type=1,
+        func=sent.append,
+    )
+    blind.open()
+    assert hub.hub_mac == "a0b1c2000000"
+    assert [data["data"] for data in sent] == [{"operation": 1}]
@@ -0,0 +1,103 @@
+"""Tests of GetDeviceListAck handling, on the event loop and in threads."""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import connectorlocal
+from hub_simulator import FRONTADDRESS, REPLYPORT, HubSimulator
+
+
+def _device_list_ack(mac, msgid):
+    """return a GetDeviceListAck of a hub without blinds."""
+    return {
+        "msgType": "GetDeviceListAck",
+        "mac": mac,
+        "msgID": msgid,
+        "token": "token",
+        "data": [],
+    }
+
+
+def test_acks_of_a_hub_are_handled_one_at_a_time():
+    """A hub's acks never run at once, and the newest waiting one is next."""
+    connector = connectorlocal.ConnectorHub(ip=["127.0.0.1"], key="0" * 16)
+    connector._executor = ThreadPoolExecutor(max_workers=connectorlocal.ACK_WORKERS)
+    started = threading.Event()
+    active = []
+    handled = []
+
+    def _get_devicelist_ack(data, ip):
+        active.append(data["msgID"])
+        started.set()
+        time.sleep(0.05)
+        handled.append((data["msgID"], len(active)))
+        active.remove(data["msgID"])
+
+    connector._get_devicelist_ack = _get_devicelist_ack
+    try:
+        connector._queue_devicelist_ack(_device_list_ack("a0b1c2000000", 1), None)
+        assert started.wait(1)
+        for msgid in (2, 3, 4):
+            connector._queue_devicelist_ack(
+                _device_list_ack("a0b1c2000000", msgid), None
+            )
+        deadline = time.monotonic() + 1
+        while connector._acks_busy and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert handled == [(1, 1), (4, 1)]
+        assert not connector._acks_busy
+    finally:
+        connector._executor.shutdown()
+
+
+def test_repeated_device_list_is_dropped(connected):
+    """The same device list answering a second request is not handled again."""
+
+    async def run():
+        async with connected(hubs=1, blinds=2) as (simulator, connector):
+            connector.get_device_list()
+            connector.get_device_list()
+            await asyncio.sleep(0.3)
+            counters = connector.metrics.snapshot()["counters"]
+            dropped = counters["dropped"]["reason"]
+            assert dropped["repeated_device_list"] >= 1
+
+    asyncio.run(run())
+
+
+def test_thread_mode_discovers_and_moves():
+    """The blocking receive thread finds the blinds and their acks arrive."""
+
+    async def run():
+        simulator = HubSimulator(hubs=2, blinds=2)
+        await simulator.start()
+        connector = connectorlocal.ConnectorHub(
+            ip=simulator.ips,
+            key=simulator.key,
+            send_address=FRONTADDRESS,
+            send_port=simulator.port,
+            receive_port=REPLYPORT,
+        )
+        try:
+            connector.start_receive_data()
+            devices = await connector.device_list(timeout=10)
+            assert set(devices) == {hub.mac for hub in simulator.hubs}
+            hub = simulator.hubs[0]
+            blinds = devices[hub.mac].blinds_list
+            assert set(blinds) == set(hub.blinds)
+            blind = next(iter(blinds.values()))
+            blind.target_position(40)
+            for _ in range(50):
+                if blind.position == 40:
+                    break
+                await asyncio.sleep(0.1)
+            assert hub.blinds[blind.mac].position == 40
+            assert blind.position == 40
+        finally:
+            connector.close_receive_data()
+            simulator.close()
+            await asyncio.sleep(0.1)
+
+    asyncio.run(run())
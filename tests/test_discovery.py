@@ -0,0 +1,80 @@
+"""Tests of discovery finishing on the last answer."""
+
+import asyncio
+import logging
+import time
+
+import connectorlocal
+from hub_simulator import FRONTADDRESS, REPLYPORT, HubSimulator
+
+
+def _connector(ips, simulator):
+    """return a ConnectorHub for ips, talking to the simulator."""
+    return connectorlocal.ConnectorHub(
+        ip=ips,
+        key=simulator.key,
+        send_address=FRONTADDRESS,
+        send_port=simulator.port,
+        receive_port=REPLYPORT,
+    )
+
+
+def test_discovery_ends_with_the_last_blind():
+    """device_list returns once every listed blind answered, progress on the way."""
+
+    async def run():
+        simulator = HubSimulator(hubs=2, blinds=6)
+        await simulator.start()
+        connector = _connector(simulator.ips, simulator)
+        seen = []
+
+        async def watch():
+            while True:
+                seen.append(dict(connector.discovery_progress))
+                await asyncio.sleep(0.05)
+
+        try:
+            start = time.monotonic()
+            await connector.async_start()
+            watcher = asyncio.ensure_future(watch())
+            devices = await connector.device_list()
+            elapsed = time.monotonic() - start
+            watcher.cancel()
+            assert set(devices) == {hub.mac for hub in simulator.hubs}
+            assert elapsed < connectorlocal.DISCOVERY_RESEND
+            assert connector.discovery_progress == {
+                hub.mac: (6, 6) for hub in simulator.hubs
+            }
+            assert any(
+                answered < total
+                for progress in seen
+                for answered, total in progress.values()
+            )
+        finally:
+            connector.close_receive_data()
+            simulator.close()
+            await asyncio.sleep(0.1)
+
+    asyncio.run(run())
+
+
+def test_silent_hub_leaves_discovery_incomplete(caplog):
+    """A hub that never answers ends discovery at the timeout with the others."""
+
+    async def run():
+        simulator = HubSimulator(hubs=1, blinds=2)
+        await simulator.start()
+        connector = _connector(simulator.ips + ["127.0.0.99"], simulator)
+        try:
+            await connector.async_start()
+            devices = await connector.device_list(timeout=1)
+            assert set(devices) == {simulator.hubs[0].mac}
+            assert connector.discovery_progress == {simulator.hubs[0].mac: (2, 2)}
+        finally:
+            connector.close_receive_data()
+            simulator.close()
+            await asyncio.sleep(0.1)
+
+    with caplog.at_level(logging.WARNING):
+        asyncio.run(run())
+    assert any("Discovery is incomplete" in record.message for record in caplog.records)
@@ -0,0 +1,74 @@
+"""Tests of the MulticastListener shared by ConnectorHub."""
+
+import asyncio
+
+import connectorlocal
+from hub_simulator import FRONTADDRESS, REPLYPORT, HubSimulator
+
+
+def _connector(simulator, listener=None):
+    """return a ConnectorHub for the simulator, on the listener if given."""
+    return connectorlocal.ConnectorHub(
+        ip=simulator.ips,
+        key=simulator.key,
+        send_address=FRONTADDRESS,
+        send_port=simulator.port,
+        receive_port=REPLYPORT,
+        listener=listener,
+    )
+
+
+def test_shared_listener_delivers_to_each_connector():
+    """Two keys on one socket each get their own hubs, the last closes it."""
+
+    async def run():
+        first = HubSimulator(hubs=2, blinds=3, key="aaaaaaaaaaaaaaaa")
+        second = HubSimulator(
+            hubs=1, blinds=4, key="bbbbbbbbbbbbbbbb", port=42110, first_ip="127.0.0.10"
+        )
+        await first.start()
+        await second.start()
+        listener = connectorlocal.MulticastListener(
+            group=FRONTADDRESS, receive_port=REPLYPORT
+        )
+        one = _connector(first, listener)
+        two = _connector(second, listener)
+        try:
+            await one.async_start()
+            await two.async_start()
+            assert listener.clients == 2
+            devices = await one.device_list(timeout=5)
+            assert set(devices) == {hub.mac for hub in first.hubs}
+            devices = await two.device_list(timeout=5)
+            assert set(devices) == {hub.mac for hub in second.hubs}
+            one.close_receive_data()
+            assert listener.clients == 1
+            blind = next(iter(devices[second.hubs[0].mac].blinds_list.values()))
+            assert await blind.async_target_position(40) is not None
+            assert blind.position == 40
+            two.close_receive_data()
+            assert listener.clients == 0
+            assert listener._socket is None
+        finally:
+            one.close_receive_data()
+            two.close_receive_data()
+            first.close()
+            second.close()
+            await asyncio.sleep(0.1)
+
+    asyncio.run(run())
+
+
+def test_connector_without_listener_gets_its_own(connected):
+    """A standalone connector receives through a private listener."""
+
+    async def run():
+        async with connected(hubs=1, blinds=1) as (simulator, connector):
+            listener = connector._listener
+            assert isinstance(listener, connectorlocal.MulticastListener)
+            assert listener.clients == 1
+            connector.close_receive_data()
+            assert listener.clients == 0
+            assert listener._socket is None
+
+    asyncio.run(run())
@@ -0,0 +1,63 @@
+"""Tests of the metrics of a ConnectorHub."""
+
+import asyncio
+import json
+
+import connectorlocal
+
+
+def test_counters_gauges_and_histograms_by_label():
+    """Each value is kept in total and per label value."""
+    metrics = connectorlocal.ConnectorMetrics()
+    metrics.count("received", msgType="Report", hub="a0b1c2000000")
+    metrics.count("received", msgType="Report", hub="a0b1c2000001")
+    metrics.count("received", 2, msgType="WriteDeviceAck", hub="a0b1c2000000")
+    metrics.gauge("send_interval", 0.2, hub="a0b1c2000000")
+    metrics.observe("ack_latency", 0.003, hub="a0b1c2000000")
+    metrics.observe("ack_latency", 3)
+    snapshot = metrics.snapshot()
+    received = snapshot["counters"]["received"]
+    assert received["total"] == 4
+    assert received["msgType"] == {"Report": 2, "WriteDeviceAck": 2}
+    assert received["hub"] == {"a0b1c2000000": 3, "a0b1c2000001": 1}
+    assert snapshot["gauges"]["send_interval"] == {"hub": {"a0b1c2000000": 0.2}}
+    latency = snapshot["histograms"]["ack_latency"]
+    assert latency["total"]["count"] == 2
+    assert latency["total"]["max"] == 3
+    assert latency["total"]["buckets"]["0.005"] == 1
+    assert latency["total"]["buckets"]["inf"] == 1
+    assert latency["hub"]["a0b1c2000000"]["count"] == 1
+    json.dumps(snapshot)
+    metrics.reset()
+    assert metrics.snapshot() == {"counters": {}, "gauges": {}, "histograms": {}}
+
+
+def test_snapshot_is_not_changed_by_later_counts():
+    """A snapshot taken for diagnostics stays as it was."""
+    metrics = connectorlocal.ConnectorMetrics()
+    metrics.count("sent", msgType="WriteDevice")
+    snapshot = metrics.snapshot()
+    metrics.count("sent", msgType="WriteDevice")
+    assert snapshot["counters"]["sent"] == {"total": 1, "msgType": {"WriteDevice": 1}}
+
+
+def test_connector_counts_its_traffic(connected):
+    """Sends, receives, parse time and ack latency are recorded per hub."""
+
+    async def run():
+        async with connected(hubs=1, blinds=2) as (simulator, connector):
+            hub_mac = simulator.hubs[0].mac
+            blind = next(iter(connector.devices[hub_mac].blinds_list.values()))
+            await blind.async_target_position(30)
+            snapshot = connector.metrics.snapshot()
+            counters = snapshot["counters"]
+            assert counters["sent"]["msgType"]["WriteDevice"] >= 3
+            assert counters["received"]["msgType"]["GetDeviceListAck"] >= 1
+            assert counters["received"]["device"][blind.mac] >= 2
+            histograms = snapshot["histograms"]
+            assert histograms["parse_time"]["msgType"]["WriteDeviceAck"]["count"] >= 3
+            assert histograms["ack_latency"]["device"][blind.mac]["count"] == 2
+            assert hub_mac in snapshot["gauges"]["send_interval"]["hub"]
+            assert snapshot["gauges"]["connected"]["total"] == 1
+
+    asyncio.run(run())
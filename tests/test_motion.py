@@ -0,0 +1,93 @@
+"""Tests of the movement model of two way blinds."""
+
+import asyncio
+
+import pytest
+
+import connectorlocal
+
+
+@pytest.fixture
+def blind(clock):
+    """return a wifi motor which sends nowhere and times moves by clock."""
+    return connectorlocal.TwoWayBlind(
+        func=None,
+        mac="a0b1c2000000",
+        devicetype="22000002",
+        accesstoken=None,
+        position=0,
+        context=connectorlocal._DeviceContext(
+            "token", lambda data: None, None, clock=clock
+        ),
+    )
+
+
+def _report(blind, clock, position, after=0.5):
+    """let time pass and report a position."""
+    clock.now += after
+    blind.set_state(position, 0)
+
+
+def test_commanded_move_is_predicted(blind, clock):
+    """Between reports the position moves on at the learned speed."""
+    blind.close()
+    assert blind.isclosing
+    for position in (10, 20, 30):
+        _report(blind, clock, position)
+    clock.now += 0.25
+    assert blind.predicted_position == pytest.approx(35)
+    assert blind.isclosing and not blind.isopening
+
+
+def test_report_after_stop_is_the_resting_position(blind, clock):
+    """The last report after a stop does not start a move again."""
+    blind.close()
+    for position in (10, 20, 30):
+        _report(blind, clock, position)
+    blind.stop()
+    _report(blind, clock, 33)
+    for _ in range(4):
+        clock.now += 0.5
+        assert blind.predicted_position == 33
+    assert not blind.is_moving
+    assert not blind.isclosing
+
+
+def test_move_without_command_needs_two_changes(blind, clock):
+    """A single changed report is not taken as a move."""
+    _report(blind, clock, 40)
+    assert not blind.is_moving
+    _report(blind, clock, 50)
+    assert blind.isclosing
+    clock.now += connectorlocal.MOTION_TIMEOUT
+    assert not blind.is_moving
+
+
+def test_changes_far_apart_are_no_move(blind, clock):
+    """Two changes further apart than MOTION_TIMEOUT are no move."""
+    _report(blind, clock, 40)
+    _report(blind, clock, 50, after=connectorlocal.MOTION_TIMEOUT + 1)
+    assert not blind.is_moving
+
+
+def test_move_ends_at_the_target(blind, clock):
+    """Reaching the target ends the move and the prediction."""
+    blind.target_position(20)
+    _report(blind, clock, 10)
+    _report(blind, clock, 20)
+    assert not blind.is_moving
+    clock.now += 1
+    assert blind.predicted_position == 20
+
+
+def test_queued_move_starts_motion(connected):
+    """A move queued for a group command is tracked before it is sent."""
+
+    async def run():
+        async with connected(hubs=1, blinds=1, travel_time=5) as (simulator, hub):
+            blind = next(iter(hub.devices[simulator.hubs[0].mac].blinds_list.values()))
+            future = hub.async_queue_move(blind.mac, {"operation": 0})
+            assert blind.isclosing
+            await future
+
+    asyncio.run(run())
@@ -0,0 +1,68 @@
+"""Tests of the quick check of the hub IPs and the key."""
+
+import asyncio
+import socket
+
+import connectorlocal
+from hub_simulator import FRONTADDRESS, REPLYPORT, HubSimulator
+
+
+def _probe(simulator, ips=None, key=None, timeout=1.5):
+    """return the results of probing the simulator."""
+
+    async def run():
+        await simulator.start()
+        connector = connectorlocal.ConnectorHub(
+            ip=simulator.ips if ips is None else ips,
+            key=simulator.key if key is None else key,
+            send_address=FRONTADDRESS,
+            send_port=simulator.port,
+            receive_port=REPLYPORT,
+        )
+        try:
+            return await connector.async_probe(timeout=timeout)
+        finally:
+            simulator.close()
+            await asyncio.sleep(0.1)
+
+    return asyncio.run(run())
+
+
+def test_probe_answers_for_each_ip():
+    """Hubs which answer are ok, an IP without a hub has no answer."""
+    simulator = HubSimulator(hubs=2, blinds=3)
+    results = _probe(simulator, ips=simulator.ips + ["127.0.0.99"])
+    assert results == {
+        simulator.ips[0]: connectorlocal.PROBE_OK,
+        simulator.ips[1]: connectorlocal.PROBE_OK,
+        "127.0.0.99": connectorlocal.PROBE_NO_ANSWER,
+    }
+    # a list request per round and one read per hub, not every blind
+    assert simulator.requests <= connectorlocal.PROBE_REQUESTS + 2
+
+
+def test_probe_finds_a_wrong_key():
+    """A hub refusing the accessToken of the key is a key error."""
+    simulator = HubSimulator(hubs=1, blinds=2)
+    results = _probe(simulator, key="6543210987654321")
+    assert results == {simulator.ips[0]: connectorlocal.PROBE_KEY_ERROR}
+
+
+def test_probe_without_blind_ack_is_unverified():
+    """A hub that answers while its blind does not leaves the key unchecked."""
+    simulator = HubSimulator(hubs=1, blinds=2)
+    simulator._write_device = lambda hub, blind, message, addr: None
+    results = _probe(simulator)
+    assert results == {simulator.ips[0]: connectorlocal.PROBE_UNVERIFIED}
+
+
+def test_probe_reports_a_busy_port():
+    """When the receive port cannot be opened every IP is a port error."""
+    simulator = HubSimulator(hubs=1, blinds=1)
+    busy = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    busy.bind(("0.0.0.0", REPLYPORT))
+    try:
+        results = _probe(simulator)
+    finally:
+        busy.close()
+    assert results == {simulator.ips[0]: connectorlocal.PROBE_PORT_ERROR}
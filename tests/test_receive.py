@@ -0,0 +1,60 @@
+"""Tests of filtering and parsing received datagrams."""
+
+import json
+import socket
+
+import connectorlocal
+
+
+def _connector():
+    """return a ConnectorHub for two hubs, not started."""
+    return connectorlocal.ConnectorHub(ip=["127.0.0.1", "127.0.0.2"], key="0" * 16)
+
+
+def _counters(connector):
+    """return the counters of the connector."""
+    return connector.metrics.snapshot()["counters"]
+
+
+def test_unknown_ip_is_dropped_before_parsing():
+    """A datagram from another host is counted and never parsed."""
+    connector = _connector()
+    connector._handle_datagram(b"not json", ("192.168.1.20", 32101))
+    assert _counters(connector)["dropped"]["reason"] == {"unknown_ip": 1}
+    assert "parse_time" not in connector.metrics.snapshot()["histograms"]
+    assert connector._last_receive == 0
+
+
+def test_known_ip_is_parsed_from_a_view():
+    """A datagram of a hub is parsed straight from the receive buffer."""
+    connector = _connector()
+    message = {"msgType": "Heartbeat", "mac": "a0b1c2000000", "data": {}}
+    buffer = bytearray(json.dumps(message).encode())
+    connector._handle_datagram(memoryview(buffer), ("127.0.0.2", 32101))
+    assert _counters(connector)["received"]["msgType"] == {"Heartbeat": 1}
+    assert "dropped" not in _counters(connector)
+    assert connector._last_receive > 0
+
+
+def test_known_ip_with_bad_json_is_dropped():
+    """A datagram of a hub which is not a json message is counted."""
+    connector = _connector()
+    for data in (b"not json", b"[1, 2]", b'{"mac": "a0b1c2000000"}'):
+        connector._handle_datagram(data, ("127.0.0.1", 32101))
+    assert _counters(connector)["dropped"]["reason"] == {"not_json": 3}
+
+
+def test_hub_ips_are_a_set():
+    """The IP filter looks hub IPs up in a set."""
+    connector = _connector()
+    assert connector.hub_ips == frozenset({"127.0.0.1", "127.0.0.2"})
+
+
+def test_group_socket_sends_from_the_interface():
+    """With an interface, the group is joined and sent to from its address."""
+    sock = connectorlocal._group_socket(42199, "238.0.0.18", "127.0.0.1")
+    try:
+        interface = sock.getsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, 4)
+        assert interface == socket.inet_aton("127.0.0.1")
+    finally:
+        sock.close()
@@ -0,0 +1,94 @@
+"""Tests of the supervisor which finds the hubs again."""
+
+import asyncio
+
+import pytest
+
+import connectorlocal
+
+
+@pytest.fixture(autouse=True)
+def short_intervals(monkeypatch):
+    """let the watchdog and the backoff run in fractions of a second."""
+    monkeypatch.setattr(connectorlocal, "WATCHDOG_INTERVAL", 0.5)
+    monkeypatch.setattr(connectorlocal, "PROBE_TIMEOUT", 0.2)
+    monkeypatch.setattr(connectorlocal, "RECONNECT_DELAY", 0.1)
+
+
+async def _wait_until(condition, timeout=5):
+    """wait until condition() is true, return whether it became so."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        if loop.time() > deadline:
+            return False
+        await asyncio.sleep(0.05)
+    return True
+
+
+class _FailingSocket:
+    """A socket of which every read fails."""
+
+    def __init__(self, sock):
+        """Init _FailingSocket class."""
+        self._sock = sock
+
+    def recvfrom_into(self, buffer):
+        """fail like a socket which went down."""
+        raise OSError("Network is down")
+
+    def __getattr__(self, name):
+        """pass anything else to the real socket."""
+        return getattr(self._sock, name)
+
+
+def test_silent_hubs_keep_the_socket(connected):
+    """When no hub answers the socket stays open until one answers again."""
+
+    async def run():
+        async with connected(hubs=1, blinds=1) as (simulator, connector):
+            sock = connector._listener._socket
+            states = []
+            connector.register_connection_callback(states.append)
+            simulator.loss = simulator.multicast_loss = 1.0
+            assert await _wait_until(lambda: not connector.is_connected)
+            assert connector._listener._socket is sock
+            simulator.loss = simulator.multicast_loss = 0
+            assert await _wait_until(lambda: connector.is_connected)
+            assert connector._listener._socket is sock
+            assert states == [False, True]
+            counters = connector.metrics.snapshot()["counters"]
+            assert "reconnects" not in counters
+
+    asyncio.run(run())
+
+
+def test_failed_socket_is_rebuilt(connected):
+    """After the socket fails, a new one is opened and commands go through.
+
+    The connector is connected again once a hub answers, not before.
+    """
+
+    async def run():
+        async with connected(hubs=1, blinds=1) as (simulator, connector):
+            listener = connector._listener
+            states = []
+            connector.register_connection_callback(states.append)
+            failing = listener._socket = _FailingSocket(listener._socket)
+            connector.get_device_list()
+            await asyncio.sleep(0.1)
+            simulator.loss = simulator.multicast_loss = 1.0
+            assert await _wait_until(lambda: listener._socket not in (None, failing))
+            await asyncio.sleep(0.5)
+            assert not connector.is_connected
+            simulator.loss = simulator.multicast_loss = 0
+            assert await _wait_until(lambda: connector.is_connected)
+            assert states == [False, True]
+            blind = next(
+                iter(connector.devices[simulator.hubs[0].mac].blinds_list.values())
+            )
+            assert await blind.async_target_position(40) is not None
+            counters = connector.metrics.snapshot()["counters"]
+            assert counters["reconnects"]["total"] >= 1
+
+    asyncio.run(run())
@@ -0,0 +1,86 @@
+"""Tests of the device registry shared by threads and the event loop."""
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import connectorlocal
+
+
+def test_snapshot_does_not_change():
+    """A snapshot keeps the devices it was taken with."""
+    registry = connectorlocal._Registry()
+    registry.set("a0b1c2000000", "hub")
+    snapshot = registry.snapshot()
+    registry.set("a0b1c2000001", "other hub")
+    registry.pop("a0b1c2000000")
+    assert dict(snapshot) == {"a0b1c2000000": "hub"}
+    assert dict(registry) == {"a0b1c2000001": "other hub"}
+
+
+def test_setdefault_keeps_the_first_device():
+    """Of two devices added for one mac, the first is kept by both callers."""
+    registry = connectorlocal._Registry()
+    assert registry.setdefault("a0b1c2000000", "first") == "first"
+    assert registry.setdefault("a0b1c2000000", "second") == "first"
+    assert registry["a0b1c2000000"] == "first"
+
+
+def test_readers_iterate_while_writers_add():
+    """Iterating while other threads add and remove raises nothing."""
+    registry = connectorlocal._Registry()
+    stop = threading.Event()
+
+    def write(first):
+        for index in range(first, first + 2000):
+            registry.set(f"{index:012x}", index)
+            if index % 3 == 0:
+                registry.pop(f"{index:012x}")
+        return True
+
+    def read():
+        while not stop.is_set():
+            for mac in registry:
+                registry.get(mac)
+            sum(1 for _ in registry.values())
+        return True
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        readers = [executor.submit(read) for _ in range(2)]
+        writers = [executor.submit(write, first) for first in (0, 10000)]
+        assert all(writer.result(timeout=10) for writer in writers)
+        stop.set()
+        assert all(reader.result(timeout=10) for reader in readers)
+    kept = [
+        index
+        for first in (0, 10000)
+        for index in range(first, first + 2000)
+        if index % 3
+    ]
+    assert set(registry) == {f"{index:012x}" for index in kept}
+
+
+def test_hub_blinds_list_is_a_snapshot():
+    """The blinds_list of a hub is not changed by blinds added later."""
+    hub = connectorlocal.Hub(
+        mac="a0b1c2000000",
+        version="A1",
+        token="token",
+        access_token="access",
+        devicetype="02000002",
+        func=None,
+    )
+    blinds = hub.blinds_list
+    hub.add_blinds(
+        {
+            "mac": "a0b1c20000000001",
+            "deviceType": "10000000",
+            "data": {
+                "wirelessMode": 1,
+                "type": 1,
+                "currentPosition": 0,
+                "currentAngle": 0,
+            },
+        }
+    )
+    assert not blinds
+    assert list(hub.blinds_list) == ["a0b1c20000000001"]
@@ -0,0 +1,69 @@
+"""Tests of routing Reports to their blind by mac."""
+
+import asyncio
+import json
+import logging
+
+import connectorlocal
+
+
+def _report(simulator, mac, position):
+    """send a Report of mac from the first hub."""
+    message = {
+        "msgType": "Report",
+        "mac": mac,
+        "deviceType": "10000000",
+        "data": {"currentPosition": position, "currentAngle": 0},
+    }
+    hub = simulator.hubs[0]
+    hub.transport.sendto(json.dumps(message).encode(), simulator._client)
+
+
+def test_report_reaches_its_blind(connected):
+    """A Report changes the blind routed by its mac, and only that one."""
+
+    async def run():
+        async with connected(hubs=2, blinds=2) as (simulator, connector):
+            blinds = [
+                blind
+                for hub in connector.devices.values()
+                for blind in hub.blinds_list.values()
+            ]
+            for blind in blinds:
+                assert connector._routes.get(blind.mac) is blind
+            _report(simulator, blinds[1].mac, 70)
+            await asyncio.sleep(0.2)
+            assert [blind.position for blind in blinds] == [0, 70, 0, 0]
+
+    asyncio.run(run())
+
+
+def test_unknown_device_is_counted_and_warned_once(connected, caplog):
+    """Reports of an unknown motor are counted, the warning is rate limited."""
+
+    async def run():
+        async with connected(hubs=1, blinds=1) as (simulator, connector):
+            unknown = simulator.hubs[0].mac + "ffff"
+            for position in (10, 20, 30):
+                _report(simulator, unknown, position)
+            _report(simulator, simulator.hubs[0].mac + "eeee", 10)
+            await asyncio.sleep(0.2)
+            counters = connector.metrics.snapshot()["counters"]
+            assert counters["dropped"]["reason"]["unknown_device"] == 4
+
+    with caplog.at_level(logging.WARNING):
+        asyncio.run(run())
+    warnings = [record for record in caplog.records if "newly added" in record.message]
+    assert len(warnings) == 2
+
+
+def test_unknown_device_is_warned_again_after_the_interval(caplog):
+    """After UNKNOWN_DEVICE_WARN_INTERVAL the warning comes again."""
+    connector = connectorlocal.ConnectorHub(ip=["127.0.0.1"], key="0" * 16)
+    mac = "a0b1c2000000ffff"
+    with caplog.at_level(logging.WARNING):
+        connector._unknown_device(mac)
+        connector._unknown_device(mac)
+        connector._unknown_devices[mac] -= connectorlocal.UNKNOWN_DEVICE_WARN_INTERVAL
+        connector._unknown_device(mac)
+    assert len(caplog.records) == 2
@@ -0,0 +1,84 @@
+"""Tests of the per hub send pacing."""
+
+import asyncio
+import time
+
+import connectorlocal
+
+
+def test_quick_acks_shorten_the_interval():
+    """Steady quick acks bring the interval down to SEND_INTERVAL_MIN."""
+    scheduler = connectorlocal._SendScheduler(lambda data: None)
+    for _ in range(50):
+        scheduler.ack_received(0.02)
+    assert scheduler.interval == connectorlocal.SEND_INTERVAL_MIN
+
+
+def test_slow_acks_lengthen_the_interval():
+    """Acks much slower than the best seen make the sends further apart."""
+    scheduler = connectorlocal._SendScheduler(lambda data: None)
+    scheduler.ack_received(0.02)
+    interval = scheduler.interval
+    for _ in range(10):
+        scheduler.ack_received(1)
+    assert scheduler.interval > interval
+    assert scheduler.interval <= connectorlocal.SEND_INTERVAL
+
+
+def test_lost_acks_back_off_to_send_interval():
+    """Each lost ack doubles the interval, up to SEND_INTERVAL."""
+    scheduler = connectorlocal._SendScheduler(lambda data: None)
+    scheduler.ack_lost()
+    assert scheduler.interval == 2 * connectorlocal.SEND_INTERVAL_START
+    for _ in range(5):
+        scheduler.ack_lost()
+    assert scheduler.interval == connectorlocal.SEND_INTERVAL
+
+
+def test_sends_are_one_interval_apart():
+    """A hub gets its requests one interval apart."""
+
+    async def run():
+        sent = []
+        scheduler = connectorlocal._SendScheduler(
+            lambda data: sent.append(time.monotonic())
+        )
+        await asyncio.gather(*(scheduler.send({"msgID": index}) for index in range(4)))
+        gaps = [later - earlier for earlier, later in zip(sent, sent[1:])]
+        assert min(gaps) >= scheduler.interval * 0.9
+
+    asyncio.run(run())
+
+
+def test_hubs_are_paced_in_parallel():
+    """Requests to several hubs take as long as those to one of them."""
+
+    async def run():
+        schedulers = [
+            connectorlocal._SendScheduler(lambda data: None) for _ in range(4)
+        ]
+        start = time.monotonic()
+        await asyncio.gather(
+            *(
+                scheduler.send({"msgID": index})
+                for scheduler in schedulers
+                for index in range(5)
+            )
+        )
+        elapsed = time.monotonic() - start
+        assert elapsed < 5 * connectorlocal.SEND_INTERVAL_START
+
+    asyncio.run(run())
+
+
+def test_refresh_takes_as_long_as_the_busiest_hub(connected):
+    """Polling the blinds of several hubs does not add their times up."""
+
+    async def run():
+        async with connected(hubs=4, blinds=5) as (simulator, connector):
+            start = time.monotonic()
+            await connector.async_update_devices()
+            elapsed = time.monotonic() - start
+            assert elapsed < 5 * connectorlocal.SEND_INTERVAL_START * 2
+
+    asyncio.run(run())
@@ -0,0 +1,45 @@
+"""Tests of polling only the blinds whose state is stale."""
+
+import asyncio
+
+import connectorlocal
+
+
+def test_is_stale_follows_the_last_report(clock):
+    """A blind is stale without a report, and again max_age after one."""
+    blind = connectorlocal.TwoWayBlind(
+        func=None,
+        mac="a0b1c2000000",
+        devicetype="22000002",
+        accesstoken=None,
+        context=connectorlocal._DeviceContext(None, None, None, clock=clock),
+    )
+    assert blind.is_stale(60)
+    blind.set_state(0, 0)
+    assert blind.last_report == clock.now
+    clock.now += 60
+    assert not blind.is_stale(60)
+    clock.now += 1
+    assert blind.is_stale(60)
+
+
+def test_update_devices_polls_only_stale_blinds(connected):
+    """With max_age only blinds silent for longer are read."""
+
+    async def run():
+        async with connected(hubs=2, blinds=3) as (simulator, connector):
+            blinds = [
+                blind
+                for hub in connector.devices.values()
+                for blind in hub.blinds_list.values()
+            ]
+            stale = blinds[0]
+            stale._last_report -= 100
+            reports = {blind.mac: blind.last_report for blind in blinds}
+            await connector.async_update_devices(max_age=50)
+            assert stale.last_report > reports[stale.mac]
+            assert all(blind.last_report == reports[blind.mac] for blind in blinds[1:])
+            await connector.async_update_devices()
+            assert all(blind.last_report > reports[blind.mac] for blind in blinds[1:])
+
+    asyncio.run(run())
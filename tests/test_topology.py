@@ -0,0 +1,111 @@
+"""Tests of the stored topology and of discovery starting from it."""
+
+import asyncio
+import json
+
+import connectorlocal
+from hub_simulator import FRONTADDRESS, REPLYPORT, HubSimulator
+
+
+def _connector(simulator):
+    """return a ConnectorHub for the simulator, not started yet."""
+    return connectorlocal.ConnectorHub(
+        ip=simulator.ips,
+        key=simulator.key,
+        send_address=FRONTADDRESS,
+        send_port=simulator.port,
+        receive_port=REPLYPORT,
+    )
+
+
+def test_topology_round_trip(connected):
+    """A stored topology gives the same devices and positions back."""
+
+    async def run():
+        async with connected(hubs=2, blinds=2) as (simulator, connector):
+            hub = connector.devices[simulator.hubs[0].mac]
+            blind = next(iter(hub.blinds_list.values()))
+            await blind.async_target_position(30)
+            stored = json.loads(json.dumps(connector.topology()))
+            loaded = _connector(simulator)
+            loaded.load_topology(stored)
+            assert loaded.topology() == stored
+            assert set(loaded.devices) == set(connector.devices)
+            copy = loaded.devices[hub.hub_mac].blinds_list[blind.mac]
+            assert copy.position == 30
+            assert copy.type == blind.type
+            assert copy.wireless_mode == blind.wireless_mode
+
+    asyncio.run(run())
+
+
+def test_invalid_topology_is_ignored(connected):
+    """A stored topology which cannot be read leaves no devices behind."""
+
+    async def run():
+        async with connected(hubs=1, blinds=1) as (simulator, _):
+            loaded = _connector(simulator)
+            loaded.load_topology(
+                {"devices": {"a0b1c2000000": {"ip": simulator.ips[0]}}}
+            )
+            assert not loaded.devices
+
+    asyncio.run(run())
+
+
+def test_discovery_removes_blinds_no_hub_lists(connected):
+    """Blinds of the stored topology which the hub no longer lists go."""
+
+    async def run():
+        async with connected(hubs=1, blinds=3) as (simulator, connector):
+            stored = connector.topology()
+        hub = simulator.hubs[0]
+        gone = next(iter(hub.blinds))
+        del hub.blinds[gone]
+        await simulator.start()
+        changes = []
+        loaded = _connector(simulator)
+        loaded.load_topology(stored)
+        loaded.register_topology_callback(
+            lambda added, removed: changes.append((added, removed))
+        )
+        try:
+            await loaded.async_start()
+            assert gone in loaded.devices[hub.mac].blinds_list
+            await loaded.device_list()
+            assert set(loaded.devices[hub.mac].blinds_list) == set(hub.blinds)
+            assert ([], [gone]) in changes
+        finally:
+            loaded.close_receive_data()
+            simulator.close()
+            await asyncio.sleep(0.1)
+
+    asyncio.run(run())
+
+
+def test_close_ends_discovery():
+    """device_list returns None at once when the connector closes."""
+
+    async def run():
+        simulator = HubSimulator(hubs=1, blinds=1)
+        await simulator.start()
+        # a second hub which never answers keeps discovery going
+        ips = simulator.ips + ["127.0.0.99"]
+        loaded = connectorlocal.ConnectorHub(
+            ip=ips,
+            key=simulator.key,
+            send_address=FRONTADDRESS,
+            send_port=simulator.port,
+            receive_port=REPLYPORT,
+        )
+        try:
+            await loaded.async_start()
+            waiting = asyncio.ensure_future(loaded.device_list())
+            await asyncio.sleep(0.1)
+            loaded.close_receive_data()
+            assert await asyncio.wait_for(waiting, 1) is None
+        finally:
+            simulator.close()
+            await asyncio.sleep(0.1)
+
+    asyncio.run(run())
@@ -0,0 +1,65 @@
+"""Tests of sending requests to the IP of their hub."""
+
+import asyncio
+
+import connectorlocal
+from hub_simulator import FRONTADDRESS, REPLYPORT, HubSimulator
+
+
+def test_destination_is_the_hub_of_the_device():
+    """A device request goes to its hub's IP, discovery to the group."""
+    connector = connectorlocal.ConnectorHub(
+        ip=["192.168.1.10"], key="0" * 16, unicast=True
+    )
+    connector._device_ips["a0b1c2000000"] = "192.168.1.10"
+    group = (connectorlocal.UDPIPADDRESS, connectorlocal.SENDPORT)
+    assert connector._destination({"msgType": "GetDeviceList"}) == group
+    blind = {"msgType": "WriteDevice", "mac": "a0b1c20000000001"}
+    assert connector._destination(blind) == ("192.168.1.10", connectorlocal.SENDPORT)
+    unknown = {"msgType": "WriteDevice", "mac": "d0e1f20000000001"}
+    assert connector._destination(unknown) == group
+
+
+def test_multicast_destination_without_unicast():
+    """Without unicast every request goes to the group."""
+    connector = connectorlocal.ConnectorHub(ip=["192.168.1.10"], key="0" * 16)
+    connector._device_ips["a0b1c2000000"] = "192.168.1.10"
+    blind = {"msgType": "WriteDevice", "mac": "a0b1c20000000001"}
+    assert connector._destination(blind) == (
+        connectorlocal.UDPIPADDRESS,
+        connectorlocal.SENDPORT,
+    )
+
+
+def test_unicast_commands_get_through_without_multicast():
+    """Once discovered, hubs are reached even when the group drops everything."""
+
+    async def run():
+        simulator = HubSimulator(hubs=2, blinds=2)
+        await simulator.start()
+        connector = connectorlocal.ConnectorHub(
+            ip=simulator.ips,
+            key=simulator.key,
+            send_address=FRONTADDRESS,
+            send_port=simulator.port,
+            receive_port=REPLYPORT,
+            unicast=True,
+        )
+        try:
+            await connector.async_start()
+            devices = await connector.device_list()
+            simulator.multicast_loss = 1.0
+            blinds = [
+                blind for hub in devices.values() for blind in hub.blinds_list.values()
+            ]
+            acks = await asyncio.gather(
+                *(blind.async_target_position(60) for blind in blinds)
+            )
+            assert None not in acks
+            assert [blind.position for blind in simulator.blinds] == [60] * 4
+        finally:
+            connector.close_receive_data()
+            simulator.close()
+            await asyncio.sleep(0.1)
+
+    asyncio.run(run())
@@ -0,0 +1,389 @@
+"""Stand-in Connector hubs for running ConnectorHub without hardware.
+
+Each simulated hub owns a loopback address (127.0.0.2, 127.0.0.3, ...) and
+answers GetDeviceList and WriteDevice like a real hub: it checks the
+AccessToken, acks every request and pushes a Report after each move.
+Requests can be sent to the front address, which stands in for the
+multicast group, or to the address of one hub. Linux routes the whole
+127.0.0.0/8 block to the loopback interface, so no setup is needed there.
+
+Point ConnectorHub at it with::
+
+    ConnectorHub(
+        ip=simulator.ips,
+        key=simulator.key,
+        send_address=FRONTADDRESS,
+        send_port=SIMULATORPORT,
+        receive_port=REPLYPORT,
+    )
+
+or run it on its own::
+
+    python tools/hub_simulator.py --hubs 3 --blinds 20 --latency 0.02
+"""
+
+import argparse
+import asyncio
+import ipaddress
+import json
+import logging
+import random
+
+from Cryptodome.Cipher import AES
+
+_LOGGER = logging.getLogger(__name__)
+DEFAULTKEY = "1234567890123456"
+FRONTADDRESS = "127.0.0.1"
+FIRSTHUBADDRESS = "127.0.0.2"
+SIMULATORPORT = 42100
+REPLYPORT = 42101
+HUBDEVICETYPE = "02000001"
+BLINDDEVICETYPE = "10000000"
+REPORTINTERVAL = 0.5
+
+
+def access_token(key, token):
+    """Return the AccessToken a hub expects for its token."""
+    cipher = AES.new(bytes(key, "utf-8"), AES.MODE_ECB)
+    return cipher.encrypt(bytes(token, "utf-8")).hex().upper()
+
+
+class SimulatedBlind:
+    """A blind paired with a simulated hub."""
+
+    def __init__(self, mac, wireless_mode=1, blind_type=1):
+        """Init SimulatedBlind class."""
+        self.mac = mac
+        self.wireless_mode = wireless_mode
+        self.type = blind_type
+        self.position = 0
+        self.angle = 0
+        self.target = 0
+        self.operation = 2
+        self.motion = None
+
+    def state(self):
+        """return the data of an ack or report."""
+        return {
+            "type": self.type,
+            "operation": self.operation,
+            "currentPosition": self.position,
+            "currentAngle": self.angle,
+            "currentState": 0,
+            "voltageMode": 0,
+            "batteryLevel": 1200,
+            "wirelessMode": self.wireless_mode,
+            "RSSI": -60,
+        }
+
+
+class SimulatedHub(asyncio.DatagramProtocol):
+    """A hub with its own loopback address and blinds."""
+
+    def __init__(self, simulator, ip, mac, blinds):
+        """Init SimulatedHub class."""
+        self.simulator = simulator
+        self.ip = ip
+        self.mac = mac
+        self.blinds = {blind.mac: blind for blind in blinds}
+        self.transport = None
+        self.rotate_token()
+
+    def rotate_token(self):
+        """Issue a new token, as a hub does after a restart."""
+        self.token = "".join(
+            self.simulator.random.choice("0123456789abcdef") for _ in range(16)
+        )
+        self.access_token = access_token(self.simulator.key, self.token)
+
+    def connection_made(self, transport):
+        """Keep the transport."""
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        """Deal with a request sent to this hub only."""
+        self.simulator.handle_request(data, addr, [self])
+
+    def device_list_ack(self, msgid):
+        """return the GetDeviceListAck of this hub."""
+        return {
+            "msgType": "GetDeviceListAck",
+            "msgID": msgid,
+            "mac": self.mac,
+            "deviceType": HUBDEVICETYPE,
+            "ProtocolVersion": "0.9",
+            "fwVersion": "A1.0.0_B0.0.0",
+            "token": self.token,
+            "data": [{"mac": self.mac, "deviceType": HUBDEVICETYPE}]
+            + [{"mac": mac, "deviceType": BLINDDEVICETYPE} for mac in self.blinds],
+        }
+
+
+class _FrontProtocol(asyncio.DatagramProtocol):
+    """The address every hub listens on, like the multicast group."""
+
+    def __init__(self, simulator):
+        """Init _FrontProtocol class."""
+        self.simulator = simulator
+
+    def datagram_received(self, data, addr):
+        """Deal with a request sent to all hubs."""
+        self.simulator.handle_request(data, addr, self.simulator.hubs, multicast=True)
+
+
+class HubSimulator:
+    """Simulate hubs x blinds on loopback with latency and packet loss."""
+
+    def __init__(
+        self,
+        hubs=1,
+        blinds=10,
+        key=DEFAULTKEY,
+        latency=0.0,
+        loss=0.0,
+        travel_time=0.0,
+        port=SIMULATORPORT,
+        first_ip=FIRSTHUBADDRESS,
+        seed=None,
+        multicast_loss=None,
+    ):
+        """Init HubSimulator class.
+
+        latency delays every answer, loss is the chance that a request is
+        lost on the radio and travel_time is how long a blind takes to move
+        from fully open to fully closed, sending a Report every
+        REPORTINTERVAL on the way. multicast_loss, when given, replaces loss
+        for requests sent to the front address, as Wi-Fi sends multicast at
+        the lowest rate.
+        """
+        self.key = key
+        self.latency = latency
+        self.loss = loss
+        self.multicast_loss = loss if multicast_loss is None else multicast_loss
+        self.travel_time = travel_time
+        self.port = port
+        self.random = random.Random(seed)
+        self.hubs = []
+        self.requests = 0
+        self.lost = 0
+        self.token_errors = 0
+        self._client = None
+        self._front = None
+        first = ipaddress.ip_address(first_ip)
+        for index in range(hubs):
+            mac = f"{0xA0B1C2000000 + index:012x}"
+            self.hubs.append(
+                SimulatedHub(
+                    self,
+                    str(first + index),
+                    mac,
+                    [SimulatedBlind(f"{mac}{number:04x}") for number in range(blinds)],
+                )
+            )
+
+    @property
+    def ips(self):
+        """return the addresses of the hubs."""
+        return [hub.ip for hub in self.hubs]
+
+    @property
+    def blinds(self):
+        """return every blind of every hub."""
+        return [blind for hub in self.hubs for blind in hub.blinds.values()]
+
+    async def start(self):
+        """Open the front address and the address of every hub."""
+        loop = asyncio.get_running_loop()
+        self._front, _ = await loop.create_datagram_endpoint(
+            lambda: _FrontProtocol(self), local_addr=(FRONTADDRESS, self.port)
+        )
+        for hub in self.hubs:
+            await loop.create_datagram_endpoint(
+                lambda hub=hub: hub, local_addr=(hub.ip, self.port)
+            )
+
+    def close(self):
+        """Close every address and stop the blinds."""
+        for blind in self.blinds:
+            if blind.motion is not None:
+                blind.motion.cancel()
+        for hub in self.hubs:
+            if hub.transport is not None:
+                hub.transport.close()
+        if self._front is not None:
+            self._front.close()
+
+    def handle_request(self, data, addr, hubs, multicast=False):
+        """Answer a request for the given hubs."""
+        self._client = addr
+        self.requests += 1
+        loss = self.multicast_loss if multicast else self.loss
+        if loss and self.random.random() < loss:
+            self.lost += 1
+            return
+        message = json.loads(data)
+        if message["msgType"] == "GetDeviceList":
+            for hub in hubs:
+                self._send(hub, hub.device_list_ack(message["msgID"]), addr)
+            return
+        if message["msgType"] != "WriteDevice":
+            return
+        for hub in hubs:
+            blind = hub.blinds.get(message["mac"])
+            if blind is not None:
+                self._write_device(hub, blind, message, addr)
+                return
+
+    def _write_device(self, hub, blind, message, addr):
+        """Carry out a WriteDevice and ack it."""
+        ack = {
+            "msgType": "WriteDeviceAck",
+            "msgID": message["msgID"],
+            "mac": blind.mac,
+            "deviceType": BLINDDEVICETYPE,
+        }
+        if message.get("AccessToken") != hub.access_token:
+            self.token_errors += 1
+            ack["actionResult"] = "AccessToken error"
+            self._send(hub, ack, addr)
+            return
+        data = message["data"]
+        target = None
+        if "targetPosition" in data:
+            target = int(data["targetPosition"])
+        elif "targetAngle" in data:
+            blind.angle = int(data["targetAngle"])
+            target = blind.position
+        elif data.get("operation") in (0, 1):
+            blind.operation = data["operation"]
+            target = 100 if data["operation"] == 0 else 0
+        elif data.get("operation") == 2:
+            blind.operation = 2
+            target = blind.position
+        ack["data"] = blind.state()
+        self._send(hub, ack, addr)
+        if target is not None:
+            self._move(hub, blind, target)
+
+    def _move(self, hub, blind, target):
+        """Move a blind and report where it ends up."""
+        if blind.motion is not None:
+            blind.motion.cancel()
+            blind.motion = None
+        blind.target = target
+        if not self.travel_time:
+            blind.position = target
+            self.report(hub, blind)
+            return
+        blind.motion = asyncio.get_running_loop().create_task(
+            self._travel(hub, blind, target)
+        )
+
+    async def _travel(self, hub, blind, target):
+        """Move a blind over time, reporting on the way."""
+        speed = 100 / self.travel_time
+        while blind.position != target:
+            await asyncio.sleep(REPORTINTERVAL)
+            step = round(speed * REPORTINTERVAL) or 1
+            if abs(target - blind.position) <= step:
+                blind.position = target
+            elif target > blind.position:
+                blind.position += step
+            else:
+                blind.position -= step
+            self.report(hub, blind)
+        blind.motion = None
+
+    def report(self, hub, blind):
+        """Push the state of a blind to the last client."""
+        if self._client is None:
+            return
+        self._send(
+            hub,
+            {
+                "msgType": "Report",
+                "mac": blind.mac,
+                "deviceType": BLINDDEVICETYPE,
+                "data": blind.state(),
+            },
+            self._client,
+        )
+
+    async def async_send_reports(self, count, burst=1):
+        """Push count Reports round robin over the blinds, burst at a time.
+
+        The loop runs between bursts so that a client in the same process
+        can drain its socket.
+        """
+        pairs = [(hub, blind) for hub in self.hubs for blind in hub.blinds.values()]
+        for index in range(count):
+            if index and not index % burst:
+                await asyncio.sleep(0)
+            hub, blind = pairs[index % len(pairs)]
+            hub.transport.sendto(
+                json.dumps(
+                    {
+                        "msgType": "Report",
+                        "mac": blind.mac,
+                        "deviceType": BLINDDEVICETYPE,
+                        "data": blind.state(),
+                    }
+                ).encode(),
+                self._client,
+            )
+
+    def _send(self, hub, message, addr):
+        """Send an answer from a hub after the configured latency."""
+        payload = json.dumps(message).encode()
+        if self.latency:
+            asyncio.get_running_loop().call_later(
+                self.latency, hub.transport.sendto, payload, addr
+            )
+        else:
+            hub.transport.sendto(payload, addr)
+
+
+async def _async_main(args):
+    """Run the simulator until interrupted."""
+    simulator = HubSimulator(
+        hubs=args.hubs,
+        blinds=args.blinds,
+        key=args.key,
+        latency=args.latency,
+        loss=args.loss,
+        multicast_loss=args.multicast_loss,
+        travel_time=args.travel_time,
+        port=args.port,
+        seed=args.seed,
+    )
+    await simulator.start()
+    print(f"Key {simulator.key}, send to {FRONTADDRESS}:{simulator.port}")
+    print("Hubs " + "&".join(simulator.ips))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        simulator.close()
+
+
+def main():
+    """Parse the arguments and run the simulator."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument("--hubs", type=int, default=1)
+    parser.add_argument("--blinds", type=int, default=10)
+    parser.add_argument("--key", default=DEFAULTKEY)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--loss", type=float, default=0.0)
+    parser.add_argument("--multicast-loss", type=float)
+    parser.add_argument("--travel-time", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=SIMULATORPORT)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_async_main(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()